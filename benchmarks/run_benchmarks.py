@@ -0,0 +1,233 @@
+"""
+Offline benchmark suite: starts the stub MCP / fake Ollama servers in a
+subprocess and reports latency percentiles, throughput and memory for the
+workflows, stream_chat and the sampling handler.
+
+    python -m benchmarks.run_benchmarks --iterations 50 --concurrency 8
+    python -m benchmarks.run_benchmarks --json bench.json   # keep numbers for before/after diffs
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from tabulate import tabulate
+
+import utils.config as config
+
+BENCH_MODEL = "stub:latest"
+
+
+def _configure(args, cache_dir):
+    """
+    Points the client at the stub servers and keeps every cache, store and
+    output in ``cache_dir``. Must run before the client modules are imported.
+    """
+    config.FASTMCP_URL = f"http://127.0.0.1:{args.mcp_port}/sse"
+    config.OLLAMA_HOST = f"http://127.0.0.1:{args.ollama_port}"
+    config.OLLAMA_HOSTS = [config.OLLAMA_HOST]
+    config.LLM_MODEL = BENCH_MODEL
+    config.OLLAMA_WARM_MODELS = [BENCH_MODEL]
+    config.TOOL_CACHE_ENABLED = args.cache
+    config.LLM_CACHE_ENABLED = args.cache
+    config.MANIFEST_ENABLED = args.cache
+    config.TOOL_CACHE_PATH = os.path.join(cache_dir, "tool_results.sqlite")
+    config.LLM_CACHE_PATH = os.path.join(cache_dir, "llm_replies.sqlite")
+    config.BATCH_OUTPUT_DIR = cache_dir
+    config.MANIFEST_DIR = os.path.join(cache_dir, "manifests")
+    config.RESULT_STORE_PATH = os.path.join(cache_dir, "results.sqlite")
+    config.CATALOG_PATH = os.path.join(cache_dir, "catalog.json")
+    config.CALL_GRAPH_DIR = os.path.join(cache_dir, "graphs")
+
+
+def _wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Stub server did not open port {port}")
+
+
+@contextlib.contextmanager
+def stub_servers(args):
+    """Runs benchmarks.stub_servers in a subprocess for the duration of the block."""
+    command = [
+        sys.executable, "-m", "benchmarks.stub_servers",
+        "--mcp-port", str(args.mcp_port), "--ollama-port", str(args.ollama_port),
+        "--latency", str(args.latency), "--payload-kb", str(args.payload_kb),
+        "--files", str(args.files), "--tokens", str(args.tokens), "--token-delay", str(args.token_delay),
+    ]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(command, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for_port(args.mcp_port)
+        _wait_for_port(args.ollama_port)
+        yield
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+async def measure(name, operation, iterations, concurrency):
+    """
+    Runs ``operation(i)`` ``iterations`` times with at most ``concurrency`` in
+    flight. Returns latency percentiles (ms), throughput and Python heap peak.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    extra = {}
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await operation(i)
+                if isinstance(result, dict):
+                    for key, value in result.items():
+                        extra.setdefault(key, []).append(value)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    row = {
+        "benchmark": name,
+        "n": iterations,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "ops_s": iterations / elapsed if elapsed else 0.0,
+        "heap_peak_mb": peak / (1024 * 1024),
+    }
+    for key, values in extra.items():
+        values = [v for v in values if v is not None]
+        if values:
+            row[f"{key}_p50_ms"] = percentile(values, 50) * 1000
+    return row
+
+
+async def run_suite(args):
+    # Client modules are imported after _configure so they pick up the stub endpoints
+    from clients.ollama import stream_chat
+    from clients.sampling import ollama_sampling_handler
+    from utils.mcp_session import get_mcp_session, close_all_sessions
+    from workflows.workflows import (
+        workflow_fetch_and_classify_repository,
+        workflow_get_document_information,
+        workflow_get_document_flow,
+    )
+
+    client = config.get_fastmcp_client()
+    await get_mcp_session(client).wait_connected()
+    llm = config.get_async_llm_client()
+    repo = "STUBREPO"
+
+    def filename(i):
+        return f"PROG{i % args.files:04d}"
+
+    def check(result):
+        # Workflows log failures and return None
+        if result is None:
+            raise RuntimeError("workflow failed")
+
+    async def fetch_and_classify(i):
+        check(await workflow_fetch_and_classify_repository(client, f"https://example.invalid/{repo}"))
+
+    async def document_info(i):
+        check(await workflow_get_document_information(client, repo, filename(i)))
+
+    async def document_flow(i):
+        check(await workflow_get_document_flow(client, repo, filename(i)))
+
+    async def chat_stream(i):
+        stats = {}
+        async for _ in stream_chat(llm, BENCH_MODEL, [{"role": "user", "content": f"question {i}"}], stats=stats):
+            pass
+        return {"first_token": stats.get("first_token_s")}
+
+    async def sampling(i):
+        message = SimpleNamespace(role="user", content=SimpleNamespace(text=f"sample {i}"))
+        await ollama_sampling_handler([message], SimpleNamespace(systemPrompt="bench"), None)
+
+    benchmarks = {
+        "workflow_fetch_and_classify": fetch_and_classify,
+        "workflow_document_information": document_info,
+        "workflow_document_flow": document_flow,
+        "stream_chat": chat_stream,
+        "sampling_handler": sampling,
+    }
+    selected = args.only or list(benchmarks)
+    rows = []
+    try:
+        # Workflows print their results; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in selected:
+                rows.append(await measure(name, benchmarks[name], args.iterations, args.concurrency))
+    finally:
+        await close_all_sessions()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the client against local stand-in servers.")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--mcp-port", type=int, default=9100)
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per stub MCP tool call")
+    parser.add_argument("--payload-kb", type=int, default=16)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--cache", action="store_true", help="Keep the tool/LLM caches and the flow manifest enabled")
+    parser.add_argument("--only", nargs="*", help="Run only these benchmarks")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="sac-bench-") as cache_dir:
+        _configure(args, cache_dir)
+        with stub_servers(args):
+            rows = asyncio.run(run_suite(args))
+
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(tabulate(rows, headers="keys", floatfmt=".2f"))
+    print(f"\nmax RSS: {max_rss_mb:.1f} MB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": rows, "max_rss_mb": max_rss_mb}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Local stand-ins for the FastMCP server and Ollama, used by the benchmarks.
+
+    python -m benchmarks.stub_servers --mcp-port 9100 --ollama-port 11500
+
+The MCP stub exposes the tools called by workflows/workflows.py and
+tasks/tasks.py with a configurable latency and payload size; the fake Ollama
+endpoint implements /api/chat (streaming and not), /api/generate,
+/api/version and /api/tags, streaming tokens at a configurable rate.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from aiohttp import web
+from fastmcp import FastMCP
+
+COBOL_TEMPLATE = """       IDENTIFICATION DIVISION.
+       PROGRAM-ID. {program}.
+       ENVIRONMENT DIVISION.
+       DATA DIVISION.
+       WORKING-STORAGE SECTION.
+       01 WS-COUNTER PIC 9(4) VALUE 0.
+       PROCEDURE DIVISION.
+       MAIN-PARA.
+           PERFORM INIT-PARA
+           PERFORM PROCESS-PARA UNTIL WS-COUNTER > 10
+           EXEC CICS RETURN END-EXEC.
+"""
+
+
+def _source_code(program, payload_bytes):
+    """Builds a COBOL-looking member of roughly payload_bytes."""
+    body = COBOL_TEMPLATE.format(program=program)
+    paragraph = 0
+    while len(body) < payload_bytes:
+        paragraph += 1
+        body += (
+            f"       PARA-{paragraph:04d}.\n"
+            f"           ADD 1 TO WS-COUNTER\n"
+            f"           CALL 'SUB{paragraph % 7:02d}' USING WS-COUNTER\n"
+            f"           PERFORM PARA-{paragraph + 1:04d}.\n"
+        )
+    return body
+
+
+def build_stub_mcp(latency=0.02, payload_bytes=16 * 1024, files=50):
+    """Returns a FastMCP server whose tools sleep ``latency`` seconds and return canned data."""
+    mcp = FastMCP("static-analysis-stub")
+    filenames = [f"PROG{i:04d}" for i in range(files)]
+    sources = {}
+
+    def source_for(filename):
+        if filename not in sources:
+            sources[filename] = _source_code(filename, payload_bytes)
+        return sources[filename]
+
+    @mcp.tool()
+    async def fetch_repository(repo_url: str) -> str:
+        await asyncio.sleep(latency)
+        return repo_url.rstrip("/").split("/")[-1] or "STUBREPO"
+
+    @mcp.tool()
+    async def classify_repository(repository_name: str) -> str:
+        await asyncio.sleep(latency)
+        return json.dumps({"repository": repository_name, "type": "mainframe", "languages": ["COBOL", "JCL"]})
+
+    @mcp.tool()
+    async def processed_repository(repository: str) -> str:
+        await asyncio.sleep(latency)
+        return json.dumps({"repository": repository, "files": filenames})
+
+    @mcp.tool()
+    async def get_map_files(repository: str) -> str:
+        await asyncio.sleep(latency)
+        return json.dumps([{"filename": name, "language": "COBOL"} for name in filenames])
+
+    @mcp.tool()
+    async def find_edges(repository: str, filename: str) -> str:
+        await asyncio.sleep(latency)
+        index = filenames.index(filename) if filename in filenames else 0
+        targets = [filenames[(index + step) % len(filenames)] for step in (1, 2, 5)]
+        return json.dumps([{"source": filename, "target": target, "type": "CALL"} for target in targets])
+
+    @mcp.tool()
+    async def extract_flow(repository: str, filename: str) -> str:
+        await asyncio.sleep(latency)
+        return json.dumps(_flow(filename))
+
+    @mcp.tool()
+    async def return_workspace() -> str:
+        await asyncio.sleep(latency)
+        return "/tmp/stub-workspace"
+
+    @mcp.tool()
+    async def retrieve_file_content(repository_name: str, filename: str) -> str:
+        await asyncio.sleep(latency)
+        return source_for(filename)
+
+    @mcp.tool()
+    async def file_classification(repository_name: str, filename: str) -> str:
+        await asyncio.sleep(latency)
+        return json.dumps({"filename": filename, "category": "online program"})
+
+    @mcp.tool()
+    async def get_document_info(repository: str, filename: str) -> str:
+        await asyncio.sleep(latency)
+        return json.dumps({"repository": repository, "filename": filename, "language": "COBOL", "size": payload_bytes})
+
+    @mcp.tool()
+    async def get_language_specific_prompt(language: str, source_code: str, repository_name: str, filename: str) -> str:
+        await asyncio.sleep(latency)
+        return json.dumps({
+            "system_prompt": f"You analyse {language} programs.",
+            "llm_prompt": f"Extract the flow of {filename}:\n{source_code}",
+        })
+
+    @mcp.tool()
+    async def extract_flow_with_specific_prompt(system_prompt: str, llm_prompt: str) -> str:
+        await asyncio.sleep(latency)
+        filename = llm_prompt.split("Extract the flow of ", 1)[-1].split(":", 1)[0]
+        return json.dumps(_flow(filename))
+
+    @mcp.tool()
+    async def summarize_repository_scope(repository_name: str) -> str:
+        await asyncio.sleep(latency)
+        return json.dumps([
+            {"filename": name, "analysis": {"summary": f"{name} handles step {i}", "calls": [f"SUB{i % 7:02d}"]}}
+            for i, name in enumerate(filenames)
+        ])
+
+    return mcp
+
+
+def _flow(filename):
+    return {
+        "program_id": filename,
+        "filename": filename,
+        "language": "COBOL",
+        "main_entry_points": ["MAIN-PARA"],
+        "flow_graph": [
+            {"from": "MAIN-PARA", "to": "INIT-PARA", "type": "PERFORM"},
+            {"from": "MAIN-PARA", "to": "PROCESS-PARA", "type": "PERFORM"},
+            {"from": "PROCESS-PARA", "to": "SUB01", "type": "CALL"},
+        ],
+        "path_to_critical": ["MAIN-PARA", "PROCESS-PARA", "SUB01"],
+    }
+
+
+def build_fake_ollama(tokens=64, token_delay=0.005, reply='{"result": "ok"}'):
+    """Returns an aiohttp app that mimics the Ollama HTTP API."""
+
+    def now():
+        return datetime.now(timezone.utc).isoformat()
+
+    def final_chunk(model, started, content=""):
+        elapsed = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": model, "created_at": now(), "done": True, "done_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+            "total_duration": elapsed, "load_duration": 0,
+            "prompt_eval_count": 10, "prompt_eval_duration": 0,
+            "eval_count": tokens, "eval_duration": elapsed,
+        }
+
+    async def chat(request):
+        body = await request.json()
+        model = body.get("model", "stub")
+        started = time.perf_counter()
+        if not body.get("stream", True):
+            await asyncio.sleep(token_delay * tokens)
+            return web.json_response(final_chunk(model, started, reply))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for i in range(tokens):
+            await asyncio.sleep(token_delay)
+            chunk = {"model": model, "created_at": now(), "done": False,
+                     "message": {"role": "assistant", "content": f"tok{i} "}}
+            await response.write((json.dumps(chunk) + "\n").encode())
+        await response.write((json.dumps(final_chunk(model, started)) + "\n").encode())
+        await response.write_eof()
+        return response
+
+    async def generate(request):
+        body = await request.json()
+        return web.json_response({
+            "model": body.get("model", "stub"), "created_at": now(), "response": "", "done": True,
+            "load_duration": 0, "total_duration": 0,
+        })
+
+    async def version(request):
+        return web.json_response({"version": "0.0.0-stub"})
+
+    async def tags(request):
+        return web.json_response({"models": [{"name": "stub:latest", "model": "stub:latest"}]})
+
+    app = web.Application()
+    app.router.add_post("/api/chat", chat)
+    app.router.add_post("/api/generate", generate)
+    app.router.add_get("/api/version", version)
+    app.router.add_get("/api/tags", tags)
+    return app
+
+
+async def serve(args):
+    runner = web.AppRunner(build_fake_ollama(args.tokens, args.token_delay))
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.ollama_port).start()
+    mcp = build_stub_mcp(args.latency, args.payload_kb * 1024, args.files)
+    try:
+        await mcp.run_async(transport="sse", host=args.host, port=args.mcp_port)
+    finally:
+        await runner.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub FastMCP + fake Ollama servers for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--mcp-port", type=int, default=9100)
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per MCP tool call")
+    parser.add_argument("--payload-kb", type=int, default=16, help="Size of retrieve_file_content results")
+    parser.add_argument("--files", type=int, default=50, help="Files listed per repository")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per LLM reply")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Seconds between streamed tokens")
+    asyncio.run(serve(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
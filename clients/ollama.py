@@ -1,21 +1,30 @@
+import asyncio
+import time
+
+from utils.config import STREAM_BUFFER_SIZE, HISTORY_SUMMARY_MAX_CHARS
+from utils.llm_cache import get_cached_reply, store_reply
 from utils.logger import get_logger
+from utils.metrics import (
+    LLM_REQUESTS, LLM_LATENCY, LLM_FIRST_TOKEN, LLM_TOKENS_PER_SECOND, LLM_IN_FLIGHT, LLM_LOAD_TIME,
+    LLM_INFERENCE_TIME, tokens_per_second, model_timings
+)
+from utils.tracing import record_span, span
 
 logger = get_logger(__name__)
 
-async def stream_chat(ollama_client, llm_model, chat_history):
-    """
-    Asynchronous generator that streams LLM responses chunk by chunk.
+_STREAM_END = object()
 
-    Args:
-        ollama_client: Ollama client instance.
-        llm_model (str): Model name to use (e.g., 'mistral').
-        chat_history (list): List of message dictionaries with roles and content.
 
-    Yields:
-        str: A chunk of the LLM's response content.
+async def _pump_stream(ollama_client, llm_model, chat_history, queue, usage):
+    """
+    Producer side of stream_chat: reads chunks from the async Ollama stream
+    and pushes them into the bounded queue. Blocks on a full queue, so a slow
+    consumer stops the HTTP reads instead of buffering the whole reply.
+    Generation speed and model load / inference time from the final chunk are
+    stored in ``usage``.
     """
     try:
-        completion = ollama_client.chat(
+        completion = await ollama_client.chat(
             model=llm_model,
             messages=chat_history,
             stream=True  # Enable streaming
@@ -23,39 +32,199 @@ async def stream_chat(ollama_client, llm_model, chat_history):
     except Exception as e:
         # Log or handle connection error at start
         logger.error(f"[Error] Failed to start streaming: {e}")
+        usage["error"] = True
+        await queue.put(_STREAM_END)
         return
 
-    # Yield response chunks as they arrive
-    for chunk in completion:
-        try:
-            if 'message' in chunk and 'content' in chunk['message']:
-                yield chunk['message']['content']
-        except Exception as e:
-            # Log or skip individual bad chunk
-            logger.error(f"[Warning] Skipping bad chunk: {e}")
-            continue
+    try:
+        async for chunk in completion:
+            try:
+                content = chunk['message']['content']
+            except Exception as e:
+                # Log or skip individual bad chunk
+                logger.error(f"[Warning] Skipping bad chunk: {e}")
+                continue
+            if content:
+                await queue.put(content)
+            if chunk.get('done'):
+                usage["tokens_per_second"] = tokens_per_second(chunk)
+                usage["load_s"], usage["inference_s"] = model_timings(chunk)
+    except Exception as e:
+        logger.error(f"[Error] Streaming interrupted: {e}")
+        usage["error"] = True
+    await queue.put(_STREAM_END)
+
+
+async def stream_chat(ollama_client, llm_model, chat_history, stats=None, buffer_size=STREAM_BUFFER_SIZE):
+    """
+    Asynchronous generator that streams LLM responses chunk by chunk.
+
+    The response is read by a background task on an ``ollama.AsyncClient``, so
+    the event loop stays free while tokens arrive. Chunks pass through a
+    bounded queue (backpressure), and closing or cancelling the generator
+    cancels the underlying request.
+
+    Args:
+        ollama_client: Async Ollama client instance (see get_async_llm_client).
+        llm_model (str): Model name to use (e.g., 'mistral').
+        chat_history (list): List of message dictionaries with roles and content.
+        stats (dict, optional): Filled with 'first_token_s', 'total_s', 'chunks'
+            and 'load_s' (model load time reported by Ollama) once the stream ends.
+        buffer_size (int): Maximum number of chunks buffered ahead of the consumer.
+
+    Yields:
+        str: A chunk of the LLM's response content.
+    """
+    queue = asyncio.Queue(maxsize=buffer_size)
+    started = time.perf_counter()
+    first_token_s = None
+    chunks = 0
+    usage = {}
+    producer = asyncio.create_task(_pump_stream(ollama_client, llm_model, chat_history, queue, usage))
+    LLM_IN_FLIGHT.inc(model=llm_model)
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is _STREAM_END:
+                break
+            if first_token_s is None:
+                first_token_s = time.perf_counter() - started
+            chunks += 1
+            yield chunk
+    finally:
+        if not producer.done():
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        total_s = time.perf_counter() - started
+        LLM_IN_FLIGHT.dec(model=llm_model)
+        LLM_REQUESTS.inc(model=llm_model, kind="stream", status="error" if usage.get("error") else "ok")
+        LLM_LATENCY.observe(total_s, model=llm_model, kind="stream")
+        if first_token_s is not None:
+            LLM_FIRST_TOKEN.observe(first_token_s, model=llm_model)
+        if usage.get("tokens_per_second"):
+            LLM_TOKENS_PER_SECOND.observe(usage["tokens_per_second"], model=llm_model)
+        load_s = usage.get("load_s")
+        if load_s is not None:
+            LLM_LOAD_TIME.observe(load_s, model=llm_model, kind="stream")
+            LLM_INFERENCE_TIME.observe(usage["inference_s"], model=llm_model, kind="stream")
+        if stats is not None:
+            stats.update({"first_token_s": first_token_s, "total_s": total_s, "chunks": chunks, "load_s": load_s})
+        record_span("llm:stream_chat", "llm", started, started + total_s,
+                    model=llm_model, chunks=chunks, first_token_s=first_token_s, load_s=load_s)
+        first_token = f"{first_token_s:.3f}s" if first_token_s is not None else "n/a"
+        load = f"{load_s:.3f}s" if load_s is not None else "n/a"
+        logger.info(f"stream_chat model={llm_model} chunks={chunks} first_token={first_token} "
+                    f"load={load} total={total_s:.3f}s")
 
 
-def chat(ollama_client, llm_model, prompt):
+def observe_llm_reply(llm_model, kind, started, response):
+    """Records metrics for a completed non-streaming LLM call started at ``started`` (perf_counter)."""
+    LLM_REQUESTS.inc(model=llm_model, kind=kind, status="ok")
+    LLM_LATENCY.observe(time.perf_counter() - started, model=llm_model, kind=kind)
+    rate = tokens_per_second(response)
+    if rate:
+        LLM_TOKENS_PER_SECOND.observe(rate, model=llm_model)
+    load_s, inference_s = model_timings(response)
+    if load_s is not None:
+        LLM_LOAD_TIME.observe(load_s, model=llm_model, kind=kind)
+        LLM_INFERENCE_TIME.observe(inference_s, model=llm_model, kind=kind)
+
+
+def chat(ollama_client, llm_model, prompt, use_cache=True):
     """
     Synchronous LLM call that returns the full response (non-streaming).
+    Replies are served from / stored in the LLM response cache (temperature 0).
 
     Args:
         ollama_client: Ollama client instance.
         llm_model (str): Model name to use (e.g., 'mistral').
         prompt (str): User input to send.
+        use_cache (bool): Set to False to bypass the response cache.
 
     Returns:
         str: Full content of the LLM's response.
     """
-    try:
-        response = ollama_client.chat(
-            model=llm_model,
-            messages=[{"role": "user", "content": prompt}],
-            options={'temperature': 0}
+    messages = [{"role": "user", "content": prompt}]
+    options = {'temperature': 0}
+    with span("llm:chat", "llm", model=llm_model) as trace_args:
+        cached = get_cached_reply(llm_model, messages, options, use_cache)
+        trace_args["cached"] = cached is not None
+        if cached is not None:
+            LLM_REQUESTS.inc(model=llm_model, kind="chat", status="cached")
+            return cached
+        started = time.perf_counter()
+        try:
+            with LLM_IN_FLIGHT.track(model=llm_model):
+                response = ollama_client.chat(
+                    model=llm_model,
+                    messages=messages,
+                    options=options
+                )
+            content = response['message']['content']
+            observe_llm_reply(llm_model, "chat", started, response)
+            store_reply(llm_model, messages, options, content, use_cache)
+            return content
+        except Exception as e:
+            # Log or handle call failure
+            LLM_REQUESTS.inc(model=llm_model, kind="chat", status="error")
+            logger.error(f"[Error] Failed to get response: {e}")
+            return ""
+
+
+async def async_chat(ollama_client, llm_model, messages, use_cache=True):
+    """
+    Asynchronous LLM call that returns the full response (non-streaming).
+    Replies are served from / stored in the LLM response cache (temperature 0).
+
+    Args:
+        ollama_client: Async Ollama client instance.
+        llm_model (str): Model name to use (e.g., 'mistral').
+        messages (list): Message dictionaries with roles and content.
+        use_cache (bool): Set to False to bypass the response cache.
+
+    Returns:
+        str: Full content of the LLM's response.
+    """
+    options = {'temperature': 0}
+    with span("llm:async_chat", "llm", model=llm_model) as trace_args:
+        cached = await asyncio.to_thread(get_cached_reply, llm_model, messages, options, use_cache)
+        trace_args["cached"] = cached is not None
+        if cached is not None:
+            LLM_REQUESTS.inc(model=llm_model, kind="chat", status="cached")
+            return cached
+        started = time.perf_counter()
+        try:
+            with LLM_IN_FLIGHT.track(model=llm_model):
+                response = await ollama_client.chat(model=llm_model, messages=messages, options=options)
+            content = response['message']['content']
+            observe_llm_reply(llm_model, "chat", started, response)
+            await asyncio.to_thread(store_reply, llm_model, messages, options, content, use_cache)
+            return content
+        except Exception as e:
+            LLM_REQUESTS.inc(model=llm_model, kind="chat", status="error")
+            logger.error(f"[Error] Failed to get response: {e}")
+            return ""
+
+
+HISTORY_SUMMARY_PROMPT = (
+    "Summarize the following conversation between a user and a static analysis assistant. "
+    "Keep repository names, program names, files and conclusions; drop small talk.\n\n"
+)
+
+
+def history_summarizer(ollama_client, llm_model, max_chars=HISTORY_SUMMARY_MAX_CHARS):
+    """
+    Returns an async summarize(messages) -> str callback for ChatHistory.compact.
+
+    Args:
+        ollama_client: Async Ollama client instance.
+        llm_model (str): Model used for the summary.
+        max_chars (int): Transcript size limit; older text beyond it is cut.
+    """
+    async def summarize(messages):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)[-max_chars:]
+        return await async_chat(
+            ollama_client, llm_model, [{"role": "user", "content": HISTORY_SUMMARY_PROMPT + transcript}]
         )
-        return response['message']['content']
-    except Exception as e:
-        # Log or handle call failure
-        logger.error(f"[Error] Failed to get response: {e}")
-        return ""
+
+    return summarize
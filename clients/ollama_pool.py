@@ -0,0 +1,388 @@
+import asyncio
+import threading
+import time
+
+from utils.config import (
+    OLLAMA_HOSTS,
+    OLLAMA_HOST_CONCURRENCY,
+    OLLAMA_PROBE_INTERVAL,
+    OLLAMA_PROBE_TIMEOUT,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_WARM_MODELS,
+    OLLAMA_WARM_UP_TIMEOUT,
+)
+from utils.logger import get_logger
+from utils.metrics import LLM_HOST_REQUESTS, LLM_HOST_OUTSTANDING, LLM_HOST_UP, LLM_LOAD_TIME
+from utils.resilience import is_transient
+
+logger = get_logger(__name__)
+
+
+class NoHealthyHostError(ConnectionError):
+    """Raised when every Ollama host in the pool has already failed the request."""
+
+
+def is_host_failure(error):
+    """True when a request failed because of the host (unreachable, timed out, 5xx), not the request."""
+    if is_transient(error):
+        return True
+    import httpx
+
+    if isinstance(error, httpx.TransportError):
+        return True
+    status = getattr(error, "status_code", None)
+    return type(error).__name__ == "ResponseError" and isinstance(status, int) and status >= 500
+
+
+class OllamaHost:
+    """One Ollama endpoint: its clients, load and health."""
+
+    def __init__(self, url, max_concurrency=OLLAMA_HOST_CONCURRENCY):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.served = 0
+        self.healthy = True
+        self.down_since = None
+        self.last_used = {}  # model -> time.monotonic() of its last request or warm-up
+        self._client = None
+        self._async_client = None
+
+    def client(self):
+        if self._client is None:
+            from ollama import Client as OllamaClient
+
+            self._client = OllamaClient(host=self.url)
+        return self._client
+
+    def async_client(self):
+        if self._async_client is None:
+            from ollama import AsyncClient as AsyncOllamaClient
+
+            self._async_client = AsyncOllamaClient(host=self.url)
+        return self._async_client
+
+
+class OllamaPool:
+    """
+    Spreads LLM calls over several Ollama hosts.
+
+    Each call goes to the healthy host with the fewest outstanding requests;
+    a host runs at most ``max_concurrency`` requests at a time (async calls
+    queue for a free slot). A host that fails to answer is marked down and the
+    call fails over to the next host; down hosts are probed in the background
+    (and retried after ``probe_interval`` even without probes) until they
+    answer again. When every host is down, the one down longest is still
+    tried, so a single-host pool always sends the request. A streamed reply
+    only fails over before its first chunk.
+
+    Every request asks the host to keep its model loaded for ``keep_alive``
+    seconds; start_warm_up loads the configured models on every host ahead of
+    the first request and refreshes them before an idle model would unload.
+
+    ``chat`` has the signature of ``ollama.AsyncClient.chat``, and
+    ``chat_sync`` that of ``ollama.Client.chat``, so the pool can be passed
+    wherever a client is expected (see get_async_llm_client / get_llm_client).
+    """
+
+    def __init__(self, urls, max_concurrency=OLLAMA_HOST_CONCURRENCY,
+                 probe_interval=OLLAMA_PROBE_INTERVAL, probe_timeout=OLLAMA_PROBE_TIMEOUT,
+                 keep_alive=OLLAMA_KEEP_ALIVE):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one host")
+        self.hosts = [OllamaHost(url, max_concurrency) for url in urls]
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.keep_alive = keep_alive
+        # Guards host counters; sync calls come from worker threads
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._probe_task = None
+        self._warm_task = None
+        for host in self.hosts:
+            LLM_HOST_UP.set(1, host=host.url)
+
+    # Host selection
+
+    def _candidates(self, exclude):
+        now = time.monotonic()
+        untried = [host for host in self.hosts if host not in exclude]
+        ready = [host for host in untried if host.healthy or now - host.down_since >= self.probe_interval]
+        if ready or not untried:
+            return ready
+        # Every remaining host is down: try the one down longest rather than fail without a request
+        return [min(untried, key=lambda host: host.down_since)]
+
+    def _try_acquire(self, exclude, respect_limit=True):
+        """
+        Returns the least loaded candidate host with its slot taken, None if
+        every candidate is busy, or raises NoHealthyHostError if there are none.
+        """
+        with self._lock:
+            candidates = self._candidates(exclude)
+            if not candidates:
+                raise NoHealthyHostError(
+                    f"No Ollama host left to try ({', '.join(h.url for h in self.hosts)} failed)"
+                )
+            if respect_limit:
+                candidates = [h for h in candidates if h.outstanding < h.max_concurrency]
+            if not candidates:
+                return None
+            # Least outstanding requests, then healthy before half-down, then least used
+            host = min(candidates, key=lambda h: (h.outstanding, not h.healthy, h.served))
+            host.outstanding += 1
+            host.served += 1
+        LLM_HOST_OUTSTANDING.set(host.outstanding, host=host.url)
+        return host
+
+    async def _acquire(self, exclude):
+        while True:
+            host = self._try_acquire(exclude)
+            if host is not None:
+                return host
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                # A slot may also free up on recovery of a down host
+                await asyncio.wait_for(waiter, self.probe_interval)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def _release(self, host):
+        with self._lock:
+            host.outstanding -= 1
+        LLM_HOST_OUTSTANDING.set(host.outstanding, host=host.url)
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+                break
+
+    def _wake_all(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+    def _mark_down(self, host, error):
+        if host.healthy:
+            logger.warning(f"Ollama host {host.url} marked down: {type(error).__name__}: {error}")
+        host.healthy = False
+        host.down_since = time.monotonic()
+        LLM_HOST_UP.set(0, host=host.url)
+
+    def _mark_up(self, host):
+        if not host.healthy:
+            logger.info(f"Ollama host {host.url} is back up.")
+            self._wake_all()
+        host.healthy = True
+        host.down_since = None
+        LLM_HOST_UP.set(1, host=host.url)
+
+    def _record(self, host, error=None):
+        if error is None:
+            self._mark_up(host)
+            LLM_HOST_REQUESTS.inc(host=host.url, status="ok")
+        elif is_host_failure(error):
+            self._mark_down(host, error)
+            LLM_HOST_REQUESTS.inc(host=host.url, status="failover")
+        else:
+            LLM_HOST_REQUESTS.inc(host=host.url, status="error")
+
+    def _can_fail_over(self, error, tried):
+        with self._lock:
+            return is_host_failure(error) and bool(self._candidates(tried))
+
+    def _use(self, host, args, kwargs):
+        """Notes the model as used on ``host`` and asks for it to stay loaded."""
+        if self.keep_alive is not None:
+            kwargs.setdefault("keep_alive", self.keep_alive)
+        model = args[0] if args else kwargs.get("model")
+        if model:
+            host.last_used[model] = time.monotonic()
+
+    # Client interface
+
+    async def chat(self, *args, stream=False, **kwargs):
+        """ollama.AsyncClient.chat on the least loaded healthy host, failing over on host errors."""
+        if stream:
+            return self._stream_chat(args, kwargs)
+        tried = set()
+        while True:
+            host = await self._acquire(tried)
+            tried.add(host)
+            self._use(host, args, kwargs)
+            try:
+                response = await host.async_client().chat(*args, **kwargs)
+            except Exception as e:
+                self._record(host, e)
+                if not self._can_fail_over(e, tried):
+                    raise
+                continue
+            finally:
+                self._release(host)
+            self._record(host)
+            return response
+
+    async def _stream_chat(self, args, kwargs):
+        tried = set()
+        while True:
+            host = await self._acquire(tried)
+            tried.add(host)
+            self._use(host, args, kwargs)
+            started = False
+            try:
+                stream = await host.async_client().chat(*args, stream=True, **kwargs)
+                async for chunk in stream:
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._record(host, e)
+                if started or not self._can_fail_over(e, tried):
+                    raise
+                continue
+            finally:
+                self._release(host)
+            self._record(host)
+            return
+
+    def chat_sync(self, *args, **kwargs):
+        """
+        ollama.Client.chat with the same host choice and failover. Sync calls
+        cannot wait for a slot, so they go to the least loaded host even when
+        it is at its limit.
+        """
+        tried = set()
+        while True:
+            host = self._try_acquire(tried, respect_limit=False)
+            tried.add(host)
+            self._use(host, args, kwargs)
+            try:
+                response = host.client().chat(*args, **kwargs)
+            except Exception as e:
+                self._record(host, e)
+                if not self._can_fail_over(e, tried):
+                    raise
+                continue
+            finally:
+                self._release(host)
+            self._record(host)
+            return response
+
+    # Health probes
+
+    async def probe(self, host):
+        """Asks ``host`` for its model list; marks it up or down."""
+        try:
+            await asyncio.wait_for(host.async_client().list(), self.probe_timeout)
+        except Exception as e:
+            self._mark_down(host, e)
+            return False
+        self._mark_up(host)
+        return True
+
+    async def _probe_loop(self):
+        while True:
+            await asyncio.gather(*(self.probe(host) for host in self.hosts))
+            await asyncio.sleep(self.probe_interval)
+
+    def start_health_checks(self):
+        """Starts probing every host every ``probe_interval`` seconds (idempotent; no-op for one host)."""
+        if len(self.hosts) > 1 and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.ensure_future(self._probe_loop())
+        return self._probe_task
+
+    # Model warm-up and keep-alive
+
+    async def warm_up(self, host, model):
+        """
+        Loads ``model`` on ``host`` (a generate request without a prompt) and
+        keeps it loaded for ``keep_alive`` seconds.
+
+        Returns:
+            float: Load time reported by Ollama (near 0 if it was resident), or None on failure.
+        """
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                host.async_client().generate(model=model, keep_alive=self.keep_alive), OLLAMA_WARM_UP_TIMEOUT
+            )
+        except Exception as e:
+            logger.warning(f"Warm-up of {model} on {host.url} failed: {type(e).__name__}: {e}")
+            return None
+        host.last_used[model] = time.monotonic()
+        load_s = (response["load_duration"] or 0) / 1e9
+        LLM_LOAD_TIME.observe(load_s, model=model, kind="warm-up")
+        logger.info(f"Model {model} warm on {host.url}: load {load_s:.3f}s, "
+                    f"request {time.perf_counter() - started:.3f}s")
+        return load_s
+
+    async def _warm_host(self, host, models, idle_after):
+        for model in models:
+            if host.healthy and time.monotonic() - host.last_used.get(model, float("-inf")) >= idle_after:
+                await self.warm_up(host, model)
+
+    async def _keep_warm_loop(self, models):
+        if self.keep_alive > 0:
+            # Refresh at half the keep-alive; check often enough to catch recovered hosts
+            idle_after = self.keep_alive / 2
+            interval = min(idle_after, self.probe_interval)
+        else:
+            # Kept loaded until the server stops: warm once
+            idle_after, interval = float("inf"), None
+        await asyncio.gather(*(self._warm_host(host, models, 0) for host in self.hosts))
+        while interval:
+            await asyncio.sleep(interval)
+            await asyncio.gather(*(self._warm_host(host, models, idle_after) for host in self.hosts))
+
+    def start_warm_up(self, models=None):
+        """
+        Loads ``models`` (default OLLAMA_WARM_MODELS) on every healthy host in
+        the background and keeps them loaded while the pool is open (idempotent;
+        no-op without models or with a keep-alive of 0).
+        """
+        models = OLLAMA_WARM_MODELS if models is None else models
+        if not models or self.keep_alive is None or self.keep_alive == 0:
+            return None
+        if self._warm_task is None or self._warm_task.done():
+            self._warm_task = asyncio.ensure_future(self._keep_warm_loop(list(models)))
+        return self._warm_task
+
+    async def close(self):
+        tasks = [task for task in (self._probe_task, self._warm_task) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._probe_task = self._warm_task = None
+
+    def status(self):
+        """Rows of (host, up, outstanding, limit, served)."""
+        return [(h.url, h.healthy, h.outstanding, h.max_concurrency, h.served) for h in self.hosts]
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SyncOllamaPool:
+    """ollama.Client-compatible view of an OllamaPool (``chat`` runs synchronously)."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def chat(self, *args, **kwargs):
+        return self.pool.chat_sync(*args, **kwargs)
+
+
+_pool = None
+
+
+def get_ollama_pool():
+    """Return the shared OllamaPool over OLLAMA_HOSTS."""
+    global _pool
+    if _pool is None:
+        _pool = OllamaPool(OLLAMA_HOSTS)
+    return _pool
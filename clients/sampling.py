@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from utils.config import get_async_llm_client, get_llm_model, SAMPLING_CONCURRENCY
+from utils.llm_cache import get_cached_reply, store_reply, llm_cache_key
+from utils.logger import get_logger
+from utils.metrics import LLM_IN_FLIGHT, LLM_REQUESTS, SAMPLING_REQUESTS, SAMPLING_WAIT
+from utils.tracing import span
+from clients.ollama import observe_llm_reply
+
+logger = get_logger(__name__)
+
+_semaphore = None
+_in_flight = {}
+_stats = {"requests": 0, "coalesced": 0, "cache_hits": 0, "llm_calls": 0, "errors": 0}
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(SAMPLING_CONCURRENCY)
+    return _semaphore
+
+
+def build_sampling_prompt(messages: list, params) -> str:
+    """Flattens systemPrompt + sampling messages into a single prompt."""
+    prompt = ""
+
+    if getattr(params, "systemPrompt", None):
+        prompt += f"{params.systemPrompt}\n\n"
+
+    for m in messages:
+        role = getattr(m, "role", "user")
+        content = getattr(getattr(m, "content", None), "text", "")
+        prompt += f"{role}: {content}\n"
+
+    prompt += "\nReturn your answer as a JSON object."
+    return prompt
+
+
+async def _sample(llm_model, chat_messages, options):
+    queued = time.perf_counter()
+    async with _get_semaphore():
+        started = time.perf_counter()
+        SAMPLING_WAIT.observe(started - queued)
+        cached = await asyncio.to_thread(get_cached_reply, llm_model, chat_messages, options)
+        if cached is not None:
+            _stats["cache_hits"] += 1
+            SAMPLING_REQUESTS.inc(result="cache")
+            LLM_REQUESTS.inc(model=llm_model, kind="sampling", status="cached")
+            return cached
+        _stats["llm_calls"] += 1
+        SAMPLING_REQUESTS.inc(result="llm")
+        with span("llm:sampling", "llm", model=llm_model, queued_s=started - queued):
+            try:
+                with LLM_IN_FLIGHT.track(model=llm_model):
+                    response = await get_async_llm_client().chat(
+                        model=llm_model,
+                        messages=chat_messages,
+                        options=options
+                    )
+            except Exception:
+                LLM_REQUESTS.inc(model=llm_model, kind="sampling", status="error")
+                raise
+        observe_llm_reply(llm_model, "sampling", started, response)
+        content = response.get('message', {}).get('content', '')
+        finished = time.perf_counter()
+    await asyncio.to_thread(store_reply, llm_model, chat_messages, options, content)
+    logger.info(
+        f"Sampling request served by {llm_model}: waited {started - queued:.3f}s, "
+        f"inference {finished - started:.3f}s"
+    )
+    return content
+
+
+async def ollama_sampling_handler(messages: list, params, context) -> str:
+    """
+    Async sampling handler for FastMCP.
+    Sends systemPrompt + messages to Ollama LLM and returns response content.
+
+    Runs on the async Ollama client with at most SAMPLING_CONCURRENCY calls in
+    flight; identical requests arriving while one is running share its result.
+    """
+    llm_model = get_llm_model()
+    chat_messages = [{"role": "user", "content": build_sampling_prompt(messages, params)}]
+    options = {'temperature': 0}
+    _stats["requests"] += 1
+
+    key = llm_cache_key(llm_model, chat_messages, options)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_sample(llm_model, chat_messages, options))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    else:
+        _stats["coalesced"] += 1
+        SAMPLING_REQUESTS.inc(result="coalesced")
+        logger.info("Sampling request coalesced with an identical in-flight request.")
+
+    try:
+        # shield: one caller being cancelled must not cancel the shared request
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Log and return fallback value
+        _stats["errors"] += 1
+        SAMPLING_REQUESTS.inc(result="error")
+        logger.error(f"[Error] ollama_sampling_handler failed: {e}")
+        return '{"error": "LLM call failed."}'
+
+
+def get_sampling_stats():
+    """Returns sampling request/coalescing/cache counters."""
+    return dict(_stats)
@@ -1,15 +1,28 @@
+import time
+_started = time.perf_counter()  # time to prompt is measured from here, imports included
+
+import argparse
 import asyncio
-import json
-from utils.config import get_fastmcp_client, LLM_MODEL, get_llm_client
+from utils.config import get_fastmcp_client, LLM_MODEL, get_async_llm_client, CHAT_SUMMARIZE_ON_COMPACT, TRACE_FILE
+from utils.config import METRICS_HOST, METRICS_PORT
 
 from menu import display_menu
+from workflows.workflows import workflow_summarize_repository
 from utils.prompts_utils import print_agent, input_prompt
 from utils.logger import get_logger
+from utils.mcp_session import get_mcp_session, close_all_sessions
 from utils.message_history import (
+    ChatHistory,
     history_collector, 
     add_message_to_history
 ) 
-from clients.ollama import stream_chat
+from utils.tracing import start_tracing, stop_tracing
+from utils.metrics import format_stats, start_metrics_server
+from utils.result_store import format_query
+from utils.call_graph import format_graph_query
+from utils.startup import preload, import_report
+from utils.catalog import start_prefetch
+from clients.ollama import stream_chat, history_summarizer
 
 logger = get_logger(__name__)
 
@@ -19,59 +32,122 @@ async def user_input_handler(ollama_client, user_input, client, chat_history):
     Handles user input, dispatching it to menu actions or LLM chat.
     
     Args:
-        ollama_client: Ollama client instance.
+        ollama_client: Async Ollama client instance.
         user_input (str): User input from prompt.
         client: FastMCP client instance.
-        chat_history (list): List of past conversation messages.
+        chat_history (ChatHistory): Past conversation messages (updated in place).
     """    
     if user_input.lower() == "menu":
         await display_menu(client)
+    elif user_input.lower().startswith("brief "):
+        # Repository brief as standing context for the rest of the conversation
+        brief = await workflow_summarize_repository(client, user_input.split(maxsplit=1)[1].strip())
+        if brief:
+            chat_history.set_context(f"Context about the software system under discussion:\n{brief}")
+            print_agent("Brief added to the chat context.")
+    elif user_input.lower() == "stats":
+        print_agent(format_stats())
+    elif user_input.lower().split(maxsplit=1)[0] == "query":
+        print_agent(await asyncio.to_thread(format_query, user_input[len("query"):].strip()))
+    elif user_input.lower().split(maxsplit=1)[0] == "graph":
+        print_agent(await asyncio.to_thread(format_graph_query, user_input[len("graph"):].strip()))
     elif user_input.lower() == "quit":
         print_agent("Exiting.")
         exit(0)
     else:
-        # Prepare subscribers
-        subscribers = [
-            lambda chunk: print_agent(chunk, True),
-            history_collector(chat_history)
-        ]
-
         # Start streaming
         chat_history = add_message_to_history(chat_history, "user", user_input)
         collect, finalize = history_collector(chat_history)
 
-        async for chunk in stream_chat(ollama_client, LLM_MODEL, chat_history):
+        # Keep the request within the model context before sending it
+        if chat_history.needs_compaction():
+            summarize = history_summarizer(ollama_client, LLM_MODEL) if CHAT_SUMMARIZE_ON_COMPACT else None
+            await chat_history.compact(summarize)
+
+        stats = {}
+        async for chunk in stream_chat(ollama_client, LLM_MODEL, chat_history.messages(), stats=stats):
             print_agent(chunk, True)
             collect(chunk)
         print()
+        logger.debug(f"LLM reply stats: {stats}")
 
         chat_history = finalize()        
 
+async def start_services():
+    """
+    Loads the client libraries in a worker thread, then builds the clients,
+    opens the shared MCP session, starts the Ollama host health checks and
+    model warm-up, prefetches the tools/prompts catalog and starts the
+    metrics endpoint.
+    Runs in the background so the prompt does not wait for any of it.
+
+    Returns:
+        tuple: (FastMCP client, async Ollama client, metrics server or None)
+    """
+    started = time.perf_counter()
+    await asyncio.to_thread(preload)
+    client = get_fastmcp_client()
+    ollama_client = get_async_llm_client()
+    ollama_client.start_health_checks()
+    ollama_client.start_warm_up()
+    # Open the shared MCP session in the background; menus and workflows reuse it
+    get_mcp_session(client).start()
+    start_prefetch(client)
+    metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+    logger.info(f"Clients ready after {time.perf_counter() - started:.3f}s in the background")
+    return client, ollama_client, metrics_server
+
+
 async def main():
     """
     Main event loop for the Static Analysis Client.
-    Initializes clients, greets the user, and enters the input loop.
+    Greets the user, loads the clients in the background, and enters the input loop.
     """    
     logger.info("Starting client!")
-    client = get_fastmcp_client()
-    ollama_client = get_llm_client()
-    chat_history = []
+    if TRACE_FILE:
+        start_tracing()
+    services = asyncio.create_task(start_services())
+    chat_history = ChatHistory()
 
      # Welcome messages
     print_agent("Agent -> Welcome to the Static Analysis Client!")
-    print_agent("\t Type menu for specific actions, or Quit to exit. ")
+    print_agent("\t Type menu for specific actions, brief <repository> to load a repository summary")
+    print_agent("\t as chat context, query <callers|callees|programs|flow|document> ... to look up")
+    print_agent("\t stored results, graph <repository> ... for call graph queries, stats for live")
+    print_agent("\t metrics, or Quit to exit. ")
     print_agent("\t What can I do for you today?")
+    logger.info(f"Prompt ready after {time.perf_counter() - _started:.3f}s")
 
     # User interaction loop
-    while True:
-        user_input = input_prompt("", "User").strip()
-        if not user_input:
-            continue
-        await user_input_handler(ollama_client, user_input, client, chat_history)
+    try:
+        while True:
+            # Read input off the event loop so background work keeps running
+            user_input = (await asyncio.to_thread(input_prompt, "", "User")).strip()
+            if not user_input:
+                continue
+            # Normally finished long before the first input arrives
+            client, ollama_client, _ = await services
+            await user_input_handler(ollama_client, user_input, client, chat_history)
+    finally:
+        services.cancel()
+        started_services, = await asyncio.gather(services, return_exceptions=True)
+        await close_all_sessions()
+        if isinstance(started_services, tuple):
+            await started_services[1].close()
+            if started_services[2]:
+                await started_services[2].cleanup()
+        if TRACE_FILE:
+            stop_tracing(TRACE_FILE)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Static Analysis Client")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Print an import-time breakdown of startup and exit")
+    if parser.parse_args().startup_report:
+        print(import_report())
+    else:
+        asyncio.run(main())
 
 
 
@@ -126,21 +202,3 @@ if __name__ == "__main__":
 #     except Exception as e:
 #         logger.error("Error while communicating with LLM: %s", e)
 #         return ""
-
-
-# async def user_input_handler(ollama_client, user_input, client):
-#     if user_input.lower() == "menu":
-#         await display_menu(client)
-#     elif user_input.lower() == "quit":
-#         print_agent("Exiting.")
-#         exit(0)
-#     else:
-#         stream = stream_chat(ollama_client, 'mistral', chat_history, 'Hello!')
-#         subscribers = [
-#             lambda chunk: print_agent(chunk),
-#             history_collector(chat_history)
-#         ]
-
-#         async for chunk in stream:
-#             for subscriber in subscribers:
-#                 subscriber(chunk)
\ No newline at end of file
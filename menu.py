@@ -1,11 +1,24 @@
 import json
-from utils.mcp_tools_helper import safe_get_prompt
+from utils.mcp_tools_helper import safe_call_tool, safe_get_prompt
+from utils.mcp_session import connected
+from utils.catalog import get_tools, get_prompts
 from utils.config import get_llm_client, LLM_MODEL
 from workflows.workflows import WORKFLOWS, list_workflows
 from tasks.tasks import task_get_document_info, task_retrieve_file_content
 from utils.prompts_utils import print_agent, print_menu, input_prompt
 from clients.ollama import chat as ollama_chat
 
+_menu_options = None
+
+
+def load_menu_options():
+    """Reads menu.json once and keeps it for the rest of the session."""
+    global _menu_options
+    if _menu_options is None:
+        with open("menu.json", "r", encoding="utf-8") as f:
+            _menu_options = json.load(f)
+    return _menu_options
+
 def extract_prompt_text(messages):
     """
     Extracts plain text from a list of message objects (dict or object with 'content.text').
@@ -75,7 +88,8 @@ async def prompt_action_submenu(client, prompt_obj, n):
             if args is None:
                 continue
 
-            data, error = await safe_get_prompt(client, prompt_obj.name, args)
+            async with connected(client) as session_client:
+                data, error = await safe_get_prompt(session_client, prompt_obj.name, args)
             if error:
                 print_agent(f" Error getting prompt: {error}")
                 continue
@@ -99,22 +113,20 @@ async def prompts_menu(client):
         client: The MCP client.
     """
     try:
-        async with client:
-            await client.ping()
-            prompts = await client.list_prompts()
-            while True:
-                print_menu('\n=== Prompts Menu ===')
-                for idx, prompt in enumerate(prompts, 1):
-                    print_menu(f"{idx}. {prompt.name}: {prompt.description}")
-                user_cmd = input_prompt("Select a prompt number or 'b' to go back: ").strip().lower()
-                if user_cmd == "b":
-                    break
-                if not user_cmd.isdigit() or int(user_cmd) < 1 or int(user_cmd) > len(prompts):
-                    print_agent(" Invalid selection. Please enter a valid number or 'b'.")
-                    continue
-                n = int(user_cmd)
-                prompt_obj = prompts[n - 1]
-                await prompt_action_submenu(client, prompt_obj, n)
+        prompts = await get_prompts(client)
+        while True:
+            print_menu('\n=== Prompts Menu ===')
+            for idx, prompt in enumerate(prompts, 1):
+                print_menu(f"{idx}. {prompt.name}: {prompt.description}")
+            user_cmd = input_prompt("Select a prompt number or 'b' to go back: ").strip().lower()
+            if user_cmd == "b":
+                break
+            if not user_cmd.isdigit() or int(user_cmd) < 1 or int(user_cmd) > len(prompts):
+                print_agent(" Invalid selection. Please enter a valid number or 'b'.")
+                continue
+            n = int(user_cmd)
+            prompt_obj = prompts[n - 1]
+            await prompt_action_submenu(client, prompt_obj, n)
     except Exception as e:
         print_agent(f"Could not retrieve prompts:\n{e}")
 
@@ -125,8 +137,7 @@ async def display_menu(client):
     Args:
         client: The MCP client.
     """
-    with open("menu.json", "r", encoding="utf-8") as f:
-        menu = json.load(f)
+    menu = load_menu_options()
     while True:
         print_menu("\n=== Main Menu ===")
         for key, value in menu.items():
@@ -185,39 +196,38 @@ async def show_tools(client):
         client: The MCP client.
     """
     try:
-        async with client:
-            await client.ping()
-            tools = await client.list_tools()
-            while True:
-                print_menu('\n=== Available Tools ===')
-                for idx, tool in enumerate(tools, 1):
-                    print_menu(f"{idx}. {tool.name}: {tool.description}")
-                selection = input_prompt("Select a tool number or 'b' to go back: ").strip().lower()
-                if selection == 'b':
-                    break
-                if not selection.isdigit() or int(selection) < 1 or int(selection) > len(tools):
-                    print_agent(" Invalid selection.")
-                    continue
-                tool = tools[int(selection) - 1]
-                args = {}
-                input_schema = getattr(tool, 'inputSchema', None)
-                if input_schema and 'properties' in input_schema:
-                    properties = input_schema['properties']
-                    required = input_schema.get('required', [])
-                    for arg_name, arg_info in properties.items():
-                        is_required = arg_name in required
-                        prompt_text = f"Enter value for {arg_name}" + (" (required): " if is_required else ": ")
-                        value = input_prompt(prompt_text)
-                        if is_required and not value:
-                            print(f" {arg_name} is required.")
-                            break
-                        args[arg_name] = value
-                try:
-                    data = await client.call_tool(tool.name, args)
-                    for t in data:
-                        print_agent(f" Tool result: {t.text}")
-                except Exception as e:
-                    print_agent(f" Exception running tool: {e}")
+        tools = await get_tools(client)
+        while True:
+            print_menu('\n=== Available Tools ===')
+            for idx, tool in enumerate(tools, 1):
+                print_menu(f"{idx}. {tool.name}: {tool.description}")
+            selection = input_prompt("Select a tool number or 'b' to go back: ").strip().lower()
+            if selection == 'b':
+                break
+            if not selection.isdigit() or int(selection) < 1 or int(selection) > len(tools):
+                print_agent(" Invalid selection.")
+                continue
+            tool = tools[int(selection) - 1]
+            args = {}
+            input_schema = getattr(tool, 'inputSchema', None)
+            if input_schema and 'properties' in input_schema:
+                properties = input_schema['properties']
+                required = input_schema.get('required', [])
+                for arg_name, arg_info in properties.items():
+                    is_required = arg_name in required
+                    prompt_text = f"Enter value for {arg_name}" + (" (required): " if is_required else ": ")
+                    value = input_prompt(prompt_text)
+                    if is_required and not value:
+                        print(f" {arg_name} is required.")
+                        break
+                    args[arg_name] = value
+            # safe_call_tool: shared session, tool cache (dropped after fetch_repository), retries, metrics
+            data, error = await safe_call_tool(client, tool.name, args)
+            if error:
+                print_agent(f" Exception running tool: {error}")
+                continue
+            for t in data:
+                print_agent(f" Tool result: {getattr(t, 'text', t)}")
     except Exception as e:
         print_agent(f"Could not retrieve tools:\n{e}")
 
@@ -0,0 +1,202 @@
+"""
+Headless batch runner: executes workflow / tool / prompt / query / graph requests read from
+JSONL (file or stdin) and writes one JSON result line per request.
+See README ("Headless runs") for the request format.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+
+from utils.config import get_fastmcp_client, get_async_llm_client, LLM_MODEL, RUNNER_CONCURRENCY, TRACE_FILE
+from utils.config import METRICS_HOST
+from utils.logger import get_logger
+from utils.mcp_session import connected, get_mcp_session, close_all_sessions
+from utils.tracing import start_tracing, stop_tracing
+from utils.metrics import start_metrics_server
+from utils.result_store import run_query
+from utils.call_graph import run_graph_query
+from utils.mcp_tools_helper import safe_call_tool, safe_get_prompt, get_all_texts
+from workflows.workflows import WORKFLOWS
+from clients.ollama import async_chat
+from menu import extract_prompt_text
+
+logger = get_logger(__name__)
+
+
+def _find_workflow(name):
+    for workflow in WORKFLOWS:
+        if name in (workflow["name"], workflow["function"].__name__):
+            return workflow
+    raise ValueError(f"Unknown workflow '{name}'")
+
+
+def _tool_result(response):
+    """Converts tool content items to JSON values (parsed when the text is JSON)."""
+    values = []
+    for text in get_all_texts(response):
+        try:
+            values.append(json.loads(text))
+        except (TypeError, ValueError):
+            values.append(text)
+    return values[0] if len(values) == 1 else values
+
+
+async def run_request(client, request):
+    """
+    Executes one request and returns its result value.
+    Raises on failure; the caller turns exceptions into error records.
+    """
+    kind = request.get("type")
+    name = request.get("name")
+    arguments = request.get("arguments") or {}
+    if not name:
+        raise ValueError("Request has no 'name'")
+
+    if kind == "workflow":
+        workflow = _find_workflow(name)
+        result = await workflow["function"](client, **arguments)
+        if result is None:
+            raise RuntimeError("Workflow returned no result (see app.log)")
+        return result
+
+    if kind == "tool":
+        async with connected(client) as session_client:
+            data, error = await safe_call_tool(session_client, name, arguments)
+        if error:
+            raise RuntimeError(error)
+        return _tool_result(data)
+
+    if kind == "prompt":
+        async with connected(client) as session_client:
+            data, error = await safe_get_prompt(session_client, name, arguments)
+        if error:
+            raise RuntimeError(error)
+        messages = data.get('messages', []) if isinstance(data, dict) else getattr(data, 'messages', [])
+        prompt_text = extract_prompt_text(messages)
+        if not request.get("run_llm"):
+            return {"prompt": prompt_text}
+        response = await async_chat(
+            get_async_llm_client(), LLM_MODEL, [{"role": "user", "content": prompt_text}]
+        )
+        return {"prompt": prompt_text, "response": response}
+
+    if kind == "query":
+        # Positional arguments, e.g. {"type": "query", "name": "callers", "arguments": ["SUB01"]}
+        if isinstance(arguments, dict):
+            arguments = list(arguments.values())
+        return await asyncio.to_thread(run_query, name, *arguments)
+
+    if kind == "graph":
+        # {"type": "graph", "name": "impact", "arguments": ["<repository>", "SUB01"]}
+        if isinstance(arguments, dict):
+            arguments = list(arguments.values())
+        if not arguments:
+            raise ValueError("Graph requests need the repository as first argument")
+        return await asyncio.to_thread(run_graph_query, arguments[0], name, *arguments[1:])
+
+    raise ValueError(f"Unknown request type '{kind}' (expected workflow, tool, prompt, query or graph)")
+
+
+def _parse_requests(lines):
+    """Yields (request, error) per non-empty input line."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            yield {"id": f"line-{number}"}, f"Invalid request: {e}"
+            continue
+        request.setdefault("id", f"line-{number}")
+        yield request, None
+
+
+async def run_requests(lines, out, concurrency=RUNNER_CONCURRENCY, metrics_port=0):
+    """
+    Runs all requests with at most ``concurrency`` in flight, writing one
+    result line to ``out`` per request as it completes. A non-zero
+    ``metrics_port`` serves the OpenMetrics endpoint for the duration.
+
+    Returns:
+        dict: Counts of 'ok' and 'error' results.
+    """
+    client = get_fastmcp_client()
+    get_mcp_session(client).start()
+    ollama_pool = get_async_llm_client()
+    ollama_pool.start_health_checks()
+    ollama_pool.start_warm_up()
+    metrics_server = await start_metrics_server(METRICS_HOST, metrics_port) if metrics_port else None
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    counts = {"ok": 0, "error": 0}
+
+    async def handle(request, parse_error):
+        record = {"id": request.get("id"), "type": request.get("type"), "name": request.get("name")}
+        started = time.perf_counter()
+        if parse_error:
+            record.update({"status": "error", "error": parse_error})
+        else:
+            async with semaphore:
+                record["started_at"] = time.time()
+                started = time.perf_counter()
+                try:
+                    record.update({"status": "ok", "result": await run_request(client, request)})
+                except Exception as e:
+                    logger.error(f"Request {record['id']} failed: {e}")
+                    record.update({"status": "error", "error": str(e)})
+        record["elapsed_s"] = round(time.perf_counter() - started, 4)
+        counts[record["status"]] += 1
+        async with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+    try:
+        await asyncio.gather(*(handle(request, error) for request, error in _parse_requests(lines)))
+    finally:
+        await close_all_sessions()
+        await ollama_pool.close()
+        if metrics_server:
+            await metrics_server.cleanup()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Static Analysis Client requests from JSONL.")
+    parser.add_argument("--input", default="-", help="JSONL request file ('-' for stdin)")
+    parser.add_argument("--output", default="-", help="JSONL result file ('-' for stdout)")
+    parser.add_argument("--concurrency", type=int, default=RUNNER_CONCURRENCY, help="Max requests in flight")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve OpenMetrics on this port while running")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Write a Chrome trace of the run to this file")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    if args.trace:
+        start_tracing()
+    try:
+        # Workflows print progress for the interactive CLI; keep it off the result stream
+        with contextlib.redirect_stdout(sys.stderr):
+            counts = asyncio.run(run_requests(lines, out, max(1, args.concurrency), args.metrics_port))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if args.trace:
+            stop_tracing(args.trace)
+
+    print(f"Completed: {counts['ok']} ok, {counts['error']} failed", file=sys.stderr)
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
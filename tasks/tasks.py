@@ -1,11 +1,22 @@
-from typing import Dict
+from __future__ import annotations
+
+from typing import Dict, TYPE_CHECKING
 from math import log
-from fastmcp import Client as FastMCPClient
 import json
-from utils.mcp_tools_helper import safe_call_tool_text, safe_call_tool_json, get_first_text
-from utils.logger import get_logger
+from utils.mcp_tools_helper import (
+    safe_call_tool_text,
+    safe_call_tool_json,
+    get_first_text,
+    get_all_texts,
+    iter_json_records,
+)
+from utils.logger import get_logger, summarize_payload
+from utils.mcp_session import connected
 from utils.prompts_utils import print_llm_response
 
+if TYPE_CHECKING:
+    from fastmcp import Client as FastMCPClient
+
 logger = get_logger(__name__)
 
 
@@ -41,33 +52,94 @@ async def task_get_map_files(client: FastMCPClient, repository_name: str):
     if error:
         logger.error(f"Error: {error}")
         return None
-    logger.info(data)
+    logger.info(summarize_payload(data))
+    return data
+
+
+_FILENAME_KEYS = ("filename", "file_name", "file", "name", "path")
+_FILE_LIST_KEYS = ("files", "documents", "maps", "map_files", "members")
+
+
+def _collect_filenames(data):
+    """Extracts filenames from a get_map_files / processed_repository payload."""
+    if isinstance(data, str):
+        return [data]
+    if isinstance(data, list):
+        names = []
+        for item in data:
+            if isinstance(item, str):
+                names.append(item)
+            elif isinstance(item, dict):
+                name = next((item[k] for k in _FILENAME_KEYS if item.get(k)), None)
+                if name:
+                    names.append(str(name))
+        return names
+    if isinstance(data, dict):
+        for key in _FILE_LIST_KEYS:
+            if isinstance(data.get(key), list):
+                return _collect_filenames(data[key])
+        # The payload's own keys ("repository", "status", ...) are not filenames
+        logger.warning(f"No file list found in payload with keys {sorted(data)[:10]}")
+    return []
+
+
+async def task_list_repository_files(client: FastMCPClient, repository_name: str):
+    """
+    Lists the files of a processed repository, using get_map_files and
+    falling back to processed_repository. Returns a sorted list of unique names.
+    """
+    logger.info("Listing repository files")
+    for tool, arguments in (
+        ("get_map_files", {"repository": repository_name}),
+        ("processed_repository", {"repository": repository_name}),
+    ):
+        data, error = await safe_call_tool_text(client, tool, arguments)
+        if error:
+            logger.error(f"{tool} failed: {error}")
+            continue
+        names = []
+        for text in get_all_texts(data):
+            if not text:
+                continue
+            try:
+                parsed = json.loads(text)
+            except ValueError:
+                # Plain-text listing: one filename per line
+                parsed = text.splitlines()
+            names.extend(_collect_filenames(parsed))
+        names = sorted({name.strip() for name in names if name and name.strip()})
+        if names:
+            logger.info(f"{tool} listed {len(names)} files for {repository_name}")
+            return names
+    return []
 
 
 async def task_extract_edges(
     client: FastMCPClient, repository_name: str, filename: str
 ):
-    logger.info("Extracting edges")
-    logger.info(f"Repository: {repository_name} Filename: {filename}")
-    data, error = await safe_call_tool_text(
+    """Returns the parsed find_edges result of a file, or None on error."""
+    logger.info(f"Extracting edges. Repository: {repository_name} Filename: {filename}")
+    data, error = await safe_call_tool_json(
         client, "find_edges", {"repository": repository_name, "filename": filename}
     )
     if error:
         logger.error(f"Error: {error}")
         return None
-    logger.info(data)
+    logger.debug(summarize_payload(data))
+    return data
 
 
 async def task_extract_flow(client: FastMCPClient, repository_name: str, filename: str):
-    logger.info("Extracting flow")
-    logger.info(f"Repository: {repository_name} Filename: {filename}")
-    data, error = await safe_call_tool_text(
+    """Returns the parsed extract_flow result of a file, or None on error."""
+    logger.info(f"Extracting flow. Repository: {repository_name} Filename: {filename}")
+    data, error = await safe_call_tool_json(
         client, "extract_flow", {"repository": repository_name, "filename": filename}
     )
     if error:
         logger.error(f"Error: {error}")
         return None
-    logger.info(data)
+    logger.debug(summarize_payload(data))
+    return data
 
 
 async def task_return_workspace(
@@ -78,7 +150,7 @@ async def task_return_workspace(
     if error:
         logger.error(f"Error: {error}")
         return None
-    logger.info(data)
+    logger.info(summarize_payload(data))
 
 
 async def task_classify_repository(client: FastMCPClient, repository_name: str):
@@ -89,7 +161,7 @@ async def task_classify_repository(client: FastMCPClient, repository_name: str):
     if error:
         logger.error(f"Error: {error}")
         return None
-    logger.info(data)
+    logger.info(summarize_payload(data))
 
 
 async def task_retrieve_file_content(
@@ -104,7 +176,7 @@ async def task_retrieve_file_content(
     if error:
         logger.error(f"Error: {error}")
         return None
-    logger.debug(f"{filename} Content: {data}")
+    logger.debug(f"{filename} Content: {summarize_payload(get_first_text(data))}")
     return data
 
 
@@ -120,7 +192,7 @@ async def task_classify_document(
     if error:
         logger.error(f"Error: {error}")
         return None
-    logger.info(data)
+    logger.info(summarize_payload(data))
 
 
 async def task_get_language_specific_prompt(
@@ -170,8 +242,8 @@ async def task_extract_flow_with_prompt(
 ) -> Dict:
 
     logger.info("task_extract_flow_with_prompt")
-    logger.debug(f"system_prompt: {system_prompt}")
-    logger.debug(f"llm_prompt: {llm_prompt}")
+    logger.debug(f"system_prompt: {summarize_payload(system_prompt)}")
+    logger.debug(f"llm_prompt: {summarize_payload(llm_prompt)}")
 
     data, error = await safe_call_tool_json(
         client,
@@ -206,20 +278,32 @@ async def task_get_document_info(client: FastMCPClient, repository: str, filenam
     if error:
         logger.error(f"Error: {error}")
         return None
-    logger.debug(data)
+    logger.debug(summarize_payload(data))
     return data
 
 
 
 
+async def task_iter_repository_summary(client: FastMCPClient, repository: str):
+    """
+    Yields the per-file documents of summarize_repository_scope one at a time.
+
+    The result is decoded incrementally across all content items, and each
+    item's text is released once parsed, so whole-repository summaries never
+    exist as one large object.
+    """
+    async with connected(client) as client:
+        response, error = await safe_call_tool_text(
+            client, "summarize_repository_scope", {"repository_name": repository}
+        )
+    if error:
+        raise RuntimeError(error)
+    for document in iter_json_records(response, consume=True):
+        yield document
+
+
 async def task_get_repository_summary(client: FastMCPClient, repository: str):
     try:
-        async with client:
-            await client.ping()
-            args = {}
-            args["repository_name"] = repository
-            # data = await client.call_tool("summarize_repository_scope", args)
-            data = await safe_call_tool_json(client, "summarize_repository_scope", args)
-            return data[0]
+        return [document async for document in task_iter_repository_summary(client, repository)]
     except Exception as e:
         print_llm_response(f"Could not retrieve context:\n{e}")
\ No newline at end of file
@@ -0,0 +1,399 @@
+import inspect
+import json
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+
+from utils.config import CALL_GRAPH_DIR
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_MAGIC = b"CGI1"
+
+# Edge kinds whose target is another program rather than a paragraph
+PROGRAM_TRANSFERS = {"CALL", "LINK", "XCTL", "EXEC", "START", "RUN"}
+
+
+def _csr(node_count, pairs):
+    """Compressed sparse rows: offsets[n]..offsets[n+1] index the neighbours of n in targets."""
+    offsets = array("i", [0]) * (node_count + 1)
+    for source, _, _ in pairs:
+        offsets[source + 1] += 1
+    for node in range(node_count):
+        offsets[node + 1] += offsets[node]
+    targets = array("i", [0]) * len(pairs)
+    kinds = array("i", [0]) * len(pairs)
+    position = array("i", offsets[:-1])
+    for source, target, kind in pairs:
+        targets[position[source]] = target
+        kinds[position[source]] = kind
+        position[source] += 1
+    return offsets, targets, kinds
+
+
+class CallGraph:
+    """
+    Compact call graph of a repository.
+
+    Node names (programs, paragraphs) are interned to integer ids; edges are
+    kept in CSR form, i.e. flat ``array`` offsets/targets for the forward
+    (callees) and reverse (callers) direction, so neighbour lookups are slices
+    and traversals touch no per-node Python objects. Build it once with
+    ``from_edges`` and ``save`` it; ``load`` reads the arrays straight back.
+    """
+
+    def __init__(self, names, kinds, forward, reverse, repository=None):
+        self.names = names
+        self.ids = {name: node for node, name in enumerate(names)}
+        self.kinds = kinds
+        self.out_offsets, self.out_targets, self.out_kinds = forward
+        self.in_offsets, self.in_targets, self.in_kinds = reverse
+        self.repository = repository
+        self._folded = None
+
+    @classmethod
+    def from_edges(cls, edges, repository=None):
+        """
+        Builds the graph from (source, target, kind) tuples; duplicate edges
+        are stored once.
+        """
+        ids, names = {}, []
+        kind_ids, kinds = {}, []
+        pairs = set()
+
+        def intern(value, table, values):
+            key = table.get(value)
+            if key is None:
+                key = table[value] = len(values)
+                values.append(value)
+            return key
+
+        for source, target, kind in edges:
+            pairs.add((intern(source, ids, names), intern(target, ids, names), intern(kind or "", kind_ids, kinds)))
+        pairs = sorted(pairs)
+        forward = _csr(len(names), pairs)
+        reverse = _csr(len(names), sorted((target, source, kind) for source, target, kind in pairs))
+        return cls(names, kinds, forward, reverse, repository)
+
+    @property
+    def node_count(self):
+        return len(self.names)
+
+    @property
+    def edge_count(self):
+        return len(self.out_targets)
+
+    def node(self, name):
+        """Id of ``name``; falls back to a case-insensitive match. Raises KeyError if unknown."""
+        node = self.ids.get(name)
+        if node is None:
+            if self._folded is None:
+                self._folded = {}
+                for candidate, candidate_node in self.ids.items():
+                    self._folded.setdefault(candidate.upper(), candidate_node)
+            node = self._folded.get(name.upper())
+            if node is None:
+                raise KeyError(f"'{name}' is not in the call graph")
+        return node
+
+    def _neighbours(self, node, reverse=False):
+        if reverse:
+            return self.in_targets[self.in_offsets[node]:self.in_offsets[node + 1]]
+        return self.out_targets[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def callees(self, name):
+        """(callee, kind) pairs of the direct calls made by ``name``."""
+        node = self.node(name)
+        start, end = self.out_offsets[node], self.out_offsets[node + 1]
+        return [(self.names[self.out_targets[i]], self.kinds[self.out_kinds[i]]) for i in range(start, end)]
+
+    def callers(self, name):
+        """(caller, kind) pairs of the direct calls to ``name``."""
+        node = self.node(name)
+        start, end = self.in_offsets[node], self.in_offsets[node + 1]
+        return [(self.names[self.in_targets[i]], self.kinds[self.in_kinds[i]]) for i in range(start, end)]
+
+    def reachable(self, name, reverse=False, max_depth=None):
+        """
+        Names reachable from ``name`` (breadth-first, nearest first), excluding
+        ``name`` itself. With ``reverse`` it follows calls backwards: everything
+        that can reach ``name``, i.e. what a change to it may impact.
+        """
+        start = self.node(name)
+        seen = bytearray(self.node_count)
+        seen[start] = 1
+        queue = deque([(start, 0)])
+        found = []
+        while queue:
+            node, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for neighbour in self._neighbours(node, reverse):
+                if not seen[neighbour]:
+                    seen[neighbour] = 1
+                    found.append(neighbour)
+                    queue.append((neighbour, depth + 1))
+        return [self.names[node] for node in found]
+
+    def strongly_connected_components(self):
+        """
+        Components of mutually reachable nodes (iterative Tarjan), largest
+        first. Components with more than one node, or a node calling itself,
+        are call cycles (recursion).
+        """
+        count = self.node_count
+        index = array("i", [-1]) * count
+        low = array("i", [0]) * count
+        on_stack = bytearray(count)
+        stack, components = [], []
+        counter = 0
+        for root in range(count):
+            if index[root] != -1:
+                continue
+            work = [(root, self.out_offsets[root])]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            while work:
+                node, edge = work[-1]
+                if edge < self.out_offsets[node + 1]:
+                    work[-1] = (node, edge + 1)
+                    neighbour = self.out_targets[edge]
+                    if index[neighbour] == -1:
+                        index[neighbour] = low[neighbour] = counter
+                        counter += 1
+                        stack.append(neighbour)
+                        on_stack[neighbour] = 1
+                        work.append((neighbour, self.out_offsets[neighbour]))
+                    elif on_stack[neighbour]:
+                        low[node] = min(low[node], index[neighbour])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+        components.sort(key=len, reverse=True)
+        return [[self.names[node] for node in component] for component in components]
+
+    def cycles(self):
+        """Call cycles: strongly connected components that contain a loop."""
+        cycles = []
+        for component in self.strongly_connected_components():
+            if len(component) > 1:
+                cycles.append(component)
+            else:
+                node = self.ids[component[0]]
+                if node in self._neighbours(node):
+                    cycles.append(component)
+        return cycles
+
+    def entry_points(self):
+        """Nodes nobody calls that call something (job steps, transactions, main programs)."""
+        return [
+            self.names[node] for node in range(self.node_count)
+            if self.in_offsets[node] == self.in_offsets[node + 1] and self.out_offsets[node] != self.out_offsets[node + 1]
+        ]
+
+    def paths(self, source, target=None, max_paths=100, max_depth=50):
+        """
+        Call paths from ``source`` to ``target``, or to every leaf (a node
+        that calls nothing) when no target is given. Depth-first without
+        revisiting a node on the same path; stops after ``max_paths``.
+        """
+        start = self.node(source)
+        goal = self.node(target) if target is not None else None
+        # Calls still needed to reach the target from each node (-1: cannot);
+        # a branch is abandoned once it cannot reach the target within max_depth
+        distance = None
+        if goal is not None:
+            distance = array("i", [-1]) * self.node_count
+            distance[goal] = 0
+            queue = deque([goal])
+            while queue:
+                node = queue.popleft()
+                for caller in self._neighbours(node, reverse=True):
+                    if distance[caller] == -1:
+                        distance[caller] = distance[node] + 1
+                        queue.append(caller)
+        on_path = bytearray(self.node_count)
+        on_path[start] = 1
+        path = [start]
+        work = [self.out_offsets[start]]
+        found = []
+        while work and len(found) < max_paths:
+            node = path[-1]
+            edge = work[-1]
+            is_leaf = self.out_offsets[node] == self.out_offsets[node + 1]
+            if edge == self.out_offsets[node] and len(path) > 1 and (
+                node == goal or (goal is None and is_leaf)
+            ):
+                found.append([self.names[n] for n in path])
+                edge = self.out_offsets[node + 1]  # do not continue past the goal
+            if edge < self.out_offsets[node + 1] and len(path) <= max_depth:
+                work[-1] = edge + 1
+                neighbour = self.out_targets[edge]
+                if not on_path[neighbour] and (
+                    distance is None or 0 <= distance[neighbour] <= max_depth - len(path)
+                ):
+                    on_path[neighbour] = 1
+                    path.append(neighbour)
+                    work.append(self.out_offsets[neighbour])
+                continue
+            on_path[path.pop()] = 0
+            work.pop()
+        return found
+
+    def save(self, path):
+        """Writes the graph as a JSON header (names, kinds) followed by the raw arrays."""
+        arrays = (self.out_offsets, self.out_targets, self.out_kinds, self.in_offsets, self.in_targets, self.in_kinds)
+        header = json.dumps({
+            "repository": self.repository,
+            "names": self.names,
+            "kinds": self.kinds,
+            "byteorder": sys.byteorder,
+            "itemsize": arrays[0].itemsize,
+            "lengths": [len(a) for a in arrays],
+        }, ensure_ascii=False).encode("utf-8")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(_MAGIC + struct.pack("<Q", len(header)) + header)
+            for values in arrays:
+                values.tofile(f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a graph written by ``save``."""
+        with open(path, "rb") as f:
+            if f.read(4) != _MAGIC:
+                raise ValueError(f"{path} is not a call graph file")
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size).decode("utf-8"))
+            arrays = []
+            for length in header["lengths"]:
+                values = array("i")
+                if values.itemsize != header["itemsize"]:
+                    raise ValueError(f"{path} was written on a platform with another integer size")
+                values.fromfile(f, length)
+                if header["byteorder"] != sys.byteorder:
+                    values.byteswap()
+                arrays.append(values)
+        return cls(header["names"], header["kinds"], arrays[:3], arrays[3:], header.get("repository"))
+
+
+def program_flow_edges(program, flow, programs):
+    """
+    Paragraph-level edges of one program's extracted flow, for merging into a
+    repository graph: paragraphs are qualified as ``PROGRAM.PARAGRAPH`` (names
+    like MAIN-PARA repeat in every program), while names found in ``programs``
+    and targets of program transfers (CALL, LINK, XCTL, ...) stay program
+    nodes. The program links to its entry points.
+    """
+    from utils.result_store import flow_edges
+
+    def qualify(name, kind=None):
+        if name in programs or (kind or "").upper() in PROGRAM_TRANSFERS:
+            return name
+        return f"{program}.{name}"
+
+    if isinstance(flow, dict):
+        for entry in flow.get("main_entry_points") or []:
+            if isinstance(entry, str) and entry:
+                yield program, qualify(entry), "ENTRY"
+    for source, target, kind in flow_edges(flow):
+        yield qualify(source), qualify(target, kind), kind
+
+
+def graph_path(repository):
+    return os.path.join(CALL_GRAPH_DIR, re.sub(r"[^A-Za-z0-9._-]", "_", repository) + ".cgi")
+
+
+_graphs = {}  # repository -> (file mtime, CallGraph)
+
+
+def save_call_graph(graph):
+    """Saves a repository graph to CALL_GRAPH_DIR and keeps it loaded."""
+    path = graph_path(graph.repository)
+    graph.save(path)
+    _graphs[graph.repository] = (os.path.getmtime(path), graph)
+    return path
+
+
+def get_call_graph(repository):
+    """The saved graph of a repository (reloaded when the file changes), or None if never built."""
+    path = graph_path(repository)
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    cached = _graphs.get(repository)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, CallGraph.load(path))
+        _graphs[repository] = cached
+    return cached[1]
+
+
+# name -> (function(graph, *arguments) returning rows, headers, usage)
+GRAPH_QUERIES = {
+    "callers": (lambda g, name: g.callers(name), ["caller", "type"], "callers <name>"),
+    "callees": (lambda g, name: g.callees(name), ["callee", "type"], "callees <name>"),
+    "reach": (lambda g, name: [(n,) for n in g.reachable(name)], ["reachable"], "reach <name>"),
+    "impact": (lambda g, name: [(n,) for n in g.reachable(name, reverse=True)], ["affected"], "impact <name>"),
+    "cycles": (lambda g: [(len(c), " -> ".join(c)) for c in g.cycles()], ["size", "members"], "cycles"),
+    "entries": (lambda g: [(n,) for n in g.entry_points()], ["entry point"], "entries"),
+    "paths": (lambda g, source, target=None: [(len(p) - 1, " -> ".join(p)) for p in g.paths(source, target)],
+              ["calls", "path"], "paths <from> [to]"),
+}
+
+
+def run_graph_query(repository, name, *arguments):
+    """Runs one of GRAPH_QUERIES on the saved graph of ``repository``; returns rows."""
+    if name not in GRAPH_QUERIES:
+        raise ValueError(f"Unknown graph query '{name}' (expected {', '.join(GRAPH_QUERIES)})")
+    function, _, usage = GRAPH_QUERIES[name]
+    try:
+        inspect.signature(function).bind(None, *arguments)
+    except TypeError:
+        raise ValueError(f"Usage: graph <repository> {usage}") from None
+    graph = get_call_graph(repository)
+    if graph is None:
+        raise ValueError(f"No call graph for '{repository}'; run the Build Call Graph workflow first.")
+    try:
+        return function(graph, *arguments)
+    except KeyError as e:
+        raise ValueError(str(e).strip("\"")) from None
+
+
+def format_graph_query(text):
+    """Runs a CLI graph query ('<repository> impact SUB01', ...) and formats the rows as text."""
+    from tabulate import tabulate
+
+    parts = text.split()
+    if len(parts) < 2:
+        return "Graph queries: " + "; ".join(f"graph <repository> {usage}" for _, _, usage in GRAPH_QUERIES.values())
+    started = time.perf_counter()
+    try:
+        rows = run_graph_query(parts[0], parts[1].lower(), *parts[2:])
+    except ValueError as e:
+        return str(e)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if not rows:
+        return f"No results ({elapsed_ms:.1f} ms)."
+    return tabulate(rows, headers=GRAPH_QUERIES[parts[1].lower()][1]) + f"\n{len(rows)} rows ({elapsed_ms:.1f} ms)"
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import os
+
+from utils.config import CATALOG_PATH, FASTMCP_URL
+from utils.logger import get_logger
+from utils.mcp_session import connected
+
+logger = get_logger(__name__)
+
+# kind -> (client method that lists it, mcp.types model used to restore it from disk)
+_KINDS = {
+    "tools": ("list_tools", "Tool"),
+    "prompts": ("list_prompts", "Prompt"),
+}
+
+_catalog = {}       # kind -> list of mcp.types.Tool / Prompt
+_refreshing = {}    # kind -> in-flight fetch task
+_generation = {kind: 0 for kind in _KINDS}
+_disk_loaded = False
+_prefetch_task = None
+
+
+def _load_from_disk():
+    """Fills the in-memory catalog from CATALOG_PATH if it was saved for the same server."""
+    global _disk_loaded
+    _disk_loaded = True
+    if not os.path.exists(CATALOG_PATH):
+        return
+    import mcp.types
+
+    try:
+        with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("server") != FASTMCP_URL:
+            return
+        for kind, (_, model_name) in _KINDS.items():
+            if kind in data and kind not in _catalog:
+                model = getattr(mcp.types, model_name)
+                _catalog[kind] = [model.model_validate(item) for item in data[kind]]
+        logger.info(f"Loaded MCP catalog from {CATALOG_PATH}: " +
+                    ", ".join(f"{len(items)} {kind}" for kind, items in _catalog.items()))
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable catalog file {CATALOG_PATH}: {e}")
+
+
+def _save_to_disk():
+    data = {"server": FASTMCP_URL}
+    for kind, items in _catalog.items():
+        data[kind] = [item.model_dump(mode="json") for item in items]
+    try:
+        os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
+        temp_path = CATALOG_PATH + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, CATALOG_PATH)
+    except OSError as e:
+        logger.warning(f"Could not save MCP catalog: {e}")
+
+
+async def _fetch(client, kind):
+    generation = _generation[kind]
+    method, _ = _KINDS[kind]
+    async with connected(client) as session_client:
+        items = await getattr(session_client, method)()
+    # A list_changed notification during the call makes this result stale
+    if generation == _generation[kind]:
+        _catalog[kind] = items
+        await asyncio.to_thread(_save_to_disk)
+        logger.info(f"MCP catalog refreshed: {len(items)} {kind}")
+    return items
+
+
+def refresh(client, kind):
+    """Fetches ``kind`` from the server; concurrent callers share one request."""
+    task = _refreshing.get(kind)
+    if task is None or task.done():
+        task = asyncio.ensure_future(_fetch(client, kind))
+        _refreshing[kind] = task
+        task.add_done_callback(lambda t: _refreshing.pop(kind, None) if _refreshing.get(kind) is t else None)
+    return task
+
+
+async def get_catalog(client, kind):
+    """
+    Returns the cached tools or prompts, going to the server only when the
+    catalog has never been fetched or was invalidated.
+
+    Args:
+        client: FastMCP client.
+        kind (str): 'tools' or 'prompts'.
+    """
+    if kind not in _catalog and not _disk_loaded:
+        await asyncio.to_thread(_load_from_disk)
+    if kind in _catalog:
+        return _catalog[kind]
+    return await refresh(client, kind)
+
+
+async def get_tools(client):
+    return await get_catalog(client, "tools")
+
+
+async def get_prompts(client):
+    return await get_catalog(client, "prompts")
+
+
+async def _prefetch(client):
+    if not _disk_loaded:
+        await asyncio.to_thread(_load_from_disk)
+    results = await asyncio.gather(*(refresh(client, kind) for kind in _KINDS), return_exceptions=True)
+    for kind, result in zip(_KINDS, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Could not prefetch MCP {kind}: {result}")
+
+
+def start_prefetch(client):
+    """
+    Starts loading the catalog in the background (idempotent): first the copy
+    saved by the previous run, then a refresh of every kind from the server,
+    so menus open without waiting.
+    """
+    global _prefetch_task
+    if _prefetch_task is None or _prefetch_task.done():
+        _prefetch_task = asyncio.ensure_future(_prefetch(client))
+    return _prefetch_task
+
+
+def invalidate(kind=None):
+    """Drops ``kind`` (or everything) from the catalog; the next access refetches it."""
+    for name in [kind] if kind else list(_KINDS):
+        _generation[name] += 1
+        _catalog.pop(name, None)
+        _refreshing.pop(name, None)
+    # Keep the next launch from starting with the outdated list
+    _save_to_disk()
+    logger.info(f"MCP catalog invalidated: {kind or 'all'}")
+
+
+async def catalog_message_handler(message):
+    """FastMCP message_handler: invalidates the catalog on tools/prompts list_changed notifications."""
+    from mcp.types import ServerNotification, ToolListChangedNotification, PromptListChangedNotification
+
+    if not isinstance(message, ServerNotification):
+        return
+    if isinstance(message.root, ToolListChangedNotification):
+        invalidate("tools")
+    elif isinstance(message.root, PromptListChangedNotification):
+        invalidate("prompts")
@@ -1,11 +1,151 @@
-from fastmcp import Client as FastMCPClient
-from ollama import Client as OllamaClient
+import os
 
 OLLAMA_HOST = "http://localhost:11434"
+# Ollama hosts the LLM calls are spread over (comma-separated OLLAMA_HOSTS overrides);
+# each runs at most OLLAMA_HOST_CONCURRENCY requests, down hosts are probed every
+# OLLAMA_PROBE_INTERVAL seconds
+OLLAMA_HOSTS = [h.strip() for h in os.environ.get("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if h.strip()]
+OLLAMA_HOST_CONCURRENCY = 4
+OLLAMA_PROBE_INTERVAL = 15
+OLLAMA_PROBE_TIMEOUT = 3
 LLM_MODEL = "deepseek-coder-v2:latest"
+# Models loaded on every host in the background at startup (comma-separated
+# OLLAMA_WARM_MODELS overrides; empty disables warm-up). Every request asks Ollama
+# to keep its model loaded for OLLAMA_KEEP_ALIVE seconds (negative: until the
+# server stops), and warm models left idle are refreshed before that runs out.
+OLLAMA_WARM_MODELS = [m.strip() for m in os.environ.get("OLLAMA_WARM_MODELS", LLM_MODEL).split(",") if m.strip()]
+OLLAMA_KEEP_ALIVE = float(os.environ.get("OLLAMA_KEEP_ALIVE", 30 * 60))
+OLLAMA_WARM_UP_TIMEOUT = 300
 FASTMCP_URL = "http://localhost:9000/sse"
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Local state (caches, catalogs) lives next to the code, like app.log
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+
+# Logging: written by a background thread, rotated by size.
+# LOG_LEVEL can be overridden with the LOG_LEVEL environment variable (e.g. DEBUG).
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.path.join(BASE_DIR, "app.log")
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# Longer log messages are truncated before they are queued
+LOG_MAX_MESSAGE_CHARS = 4000
+
+# Max chunks buffered between the Ollama stream reader and the consumer
+STREAM_BUFFER_SIZE = 64
+
+# Chat history context budget (estimated tokens). Above the budget the oldest turns
+# are summarised (or dropped) down to CHAT_COMPACT_TARGET of it; the last
+# CHAT_KEEP_LAST_MESSAGES messages are always kept.
+CHAT_CONTEXT_TOKENS = 8192
+CHAT_COMPACT_TARGET = 0.6
+CHAT_KEEP_LAST_MESSAGES = 4
+CHAT_SUMMARIZE_ON_COMPACT = True
+HISTORY_SUMMARY_MAX_CHARS = 16000
+
+# Chrome trace of tool/prompt/LLM/workflow calls, written on exit when set
+# (open it in chrome://tracing or https://ui.perfetto.dev)
+TRACE_FILE = os.environ.get("TRACE_FILE")
+
+# Local OpenMetrics endpoint (http://METRICS_HOST:METRICS_PORT/metrics); 0 disables it
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464"))
+
+# Server-initiated sampling: max concurrent LLM calls (identical in-flight requests are shared)
+SAMPLING_CONCURRENCY = 2
+
+# Persistent MCP session (seconds)
+MCP_HEARTBEAT_INTERVAL = 30
+MCP_HEARTBEAT_TIMEOUT = 10
+MCP_CONNECT_TIMEOUT = 15
+MCP_RECONNECT_DELAY = 2
+
+# Flow extraction of large sources: files over FLOW_CHUNK_MAX_CHARS are split at
+# division/section/paragraph boundaries and the chunks extracted in parallel
+FLOW_CHUNK_MAX_CHARS = 24000
+FLOW_CHUNK_CONCURRENCY = 4
+
+# Queryable store of workflow results (document info, flows and their edges);
+# read it with the CLI 'query' command, runner.py query requests or any SQLite client
+RESULT_STORE_PATH = os.environ.get("RESULT_STORE_PATH", os.path.join(CACHE_DIR, "results.sqlite"))
+
+# Repository call graphs (Build Call Graph workflow), queried with the CLI 'graph' command
+CALL_GRAPH_DIR = os.path.join(CACHE_DIR, "graphs")
+CALL_GRAPH_CONCURRENCY = 8
+
+# Incremental re-analysis: per-repository manifests of content hashes and results.
+# A file is re-analysed only when its content or the analysis version changes;
+# bump FLOW_ANALYSIS_VERSION when prompts or flow post-processing change
+# (set MANIFEST_ENABLED = False to always re-analyse and record nothing).
+MANIFEST_ENABLED = True
+MANIFEST_DIR = os.path.join(CACHE_DIR, "manifests")
+MANIFEST_SAVE_INTERVAL = 10
+FLOW_ANALYSIS_VERSION = 1
+
+# Repository brief (map-reduce over summarize_repository_scope): LLM calls in flight,
+# input tokens per call, cap per document and target size of the final brief
+SUMMARY_CONCURRENCY = 4
+SUMMARY_BATCH_TOKENS = 3000
+SUMMARY_DOC_MAX_TOKENS = 1500
+SUMMARY_BRIEF_TOKENS = 1500
+
+# Repository-wide batch workflows
+BATCH_CONCURRENCY = 4
+BATCH_OUTPUT_DIR = "output"
+
+# Headless runner (runner.py): default max requests in flight
+RUNNER_CONCURRENCY = 4
+
+# On-disk cache of MCP tool results.
+# Only tools listed here are cached: value = TTL in seconds, None = no expiry, 0 = disabled.
+# Results are dropped when fetch_repository runs; the TTL bounds staleness when the
+# repository changes some other way.
+TOOL_CACHE_ENABLED = True
+TOOL_CACHE_PATH = os.path.join(CACHE_DIR, "tool_results.sqlite")
+TOOL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+TOOL_CACHE_POLICIES = {
+    "retrieve_file_content": 24 * 60 * 60,
+    "get_document_info": 24 * 60 * 60,
+    "classify_repository": 24 * 60 * 60,
+    "get_language_specific_prompt": 24 * 60 * 60,
+}
+# Tool call policies: per-attempt deadline (s), retries of transient errors with
+# exponential backoff + jitter, and hedge_after (s) to send a second copy of a slow
+# idempotent read (None = never). Entries override TOOL_CALL_DEFAULT_POLICY.
+TOOL_CALL_DEFAULT_POLICY = {"timeout": 300, "retries": 2, "backoff": 0.5, "max_backoff": 10, "hedge_after": None}
+TOOL_CALL_POLICIES = {
+    "retrieve_file_content": {"timeout": 60, "hedge_after": 5},
+    "get_document_info": {"timeout": 60, "hedge_after": 5},
+    "get_map_files": {"timeout": 60},
+    "processed_repository": {"timeout": 60},
+    "fetch_repository": {"timeout": 900, "retries": 0},
+    "extract_flow_with_specific_prompt": {"timeout": 900, "retries": 1},
+    "summarize_repository_scope": {"timeout": 900, "retries": 1},
+}
+# Circuit breaker: after this many consecutive transient failures, calls fail fast
+# for CIRCUIT_RESET_TIMEOUT seconds before one trial call is let through
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+
+# Tools that change repository contents; a successful call drops cached results
+TOOL_CACHE_INVALIDATED_BY = ("fetch_repository",)
+
+# Single-flight: concurrent calls with the same tool and arguments share one
+# request to the server (tools in TOOL_CACHE_INVALIDATED_BY always run on their own)
+TOOL_SINGLE_FLIGHT = True
+
+# Tools/prompts listing, kept between runs and refreshed in the background
+CATALOG_PATH = os.path.join(CACHE_DIR, "catalog.json")
+
+# On-disk cache of temperature-0 LLM replies (set LLM_CACHE_ENABLED = False to bypass)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = os.path.join(CACHE_DIR, "llm_replies.sqlite")
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+LLM_CACHE_MAX_AGE = 30 * 24 * 3600
+
 _ollama_client = None
+_ollama_async_client = None
 _fastmcp_client = None
 
 
@@ -13,21 +153,40 @@ def get_fastmcp_client():
     """Return singleton FastMCP client instance."""
     global _fastmcp_client
     if not _fastmcp_client:
+        # Imported here: fastmcp is slow to import, and the sampling handler
+        # module reads its settings from this module
+        from fastmcp import Client as FastMCPClient
+        from clients.sampling import ollama_sampling_handler
+        from utils.catalog import catalog_message_handler
+
         _fastmcp_client = FastMCPClient(
             FASTMCP_URL,
-            sampling_handler=ollama_sampling_handler
+            sampling_handler=ollama_sampling_handler,
+            message_handler=catalog_message_handler
         )
     return _fastmcp_client
 
 
 def get_llm_client():
-    """Return singleton Ollama client instance."""
+    """Return singleton synchronous Ollama client (a view of the OLLAMA_HOSTS pool)."""
     global _ollama_client
     if not _ollama_client:
-        _ollama_client = OllamaClient(host=OLLAMA_HOST)
+        from clients.ollama_pool import get_ollama_pool, SyncOllamaPool
+
+        _ollama_client = SyncOllamaPool(get_ollama_pool())
     return _ollama_client
 
 
+def get_async_llm_client():
+    """Return singleton async Ollama client: the pool balancing over OLLAMA_HOSTS."""
+    global _ollama_async_client
+    if not _ollama_async_client:
+        from clients.ollama_pool import get_ollama_pool
+
+        _ollama_async_client = get_ollama_pool()
+    return _ollama_async_client
+
+
 def get_llm_model():
     """Return configured LLM model name."""
     return LLM_MODEL
@@ -36,35 +195,3 @@ def get_llm_model():
 def get_fastmcp_url():
     """Return configured FastMCP server URL."""
     return FASTMCP_URL
-
-
-async def ollama_sampling_handler(messages: list, params, context) -> str:
-    """
-    Async sampling handler for FastMCP.
-    Sends systemPrompt + messages to Ollama LLM and returns response content.
-    """
-    ollama_client = get_llm_client()
-    llm_model = get_llm_model()
-    prompt = ""
-
-    if getattr(params, "systemPrompt", None):
-        prompt += f"{params.systemPrompt}\n\n"
-
-    for m in messages:
-        role = getattr(m, "role", "user")
-        content = getattr(getattr(m, "content", None), "text", "")
-        prompt += f"{role}: {content}\n"
-
-    prompt += "\nReturn your answer as a JSON object."
-
-    try:
-        response = ollama_client.chat(
-            model=llm_model,
-            messages=[{"role": "user", "content": prompt}],
-            options={'temperature': 0}
-        )
-        return response.get('message', {}).get('content', '')
-    except Exception as e:
-        # Log and return fallback value
-        print(f"[Error] ollama_sampling_handler failed: {e}")
-        return '{"error": "LLM call failed."}'
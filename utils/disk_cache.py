@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    data   BLOB NOT NULL,
+    size   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    key       TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    digest    TEXT NOT NULL REFERENCES blobs(digest),
+    created   REAL NOT NULL,
+    accessed  REAL NOT NULL,
+    expires   REAL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed);
+CREATE INDEX IF NOT EXISTS entries_namespace ON entries(namespace);
+"""
+
+
+def hash_key(*parts):
+    """Returns a stable SHA-256 hex key for the given string parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent, content-addressed key/value cache on SQLite.
+
+    Values are zlib-compressed and stored once per content hash, so identical
+    payloads cached under different keys share storage. Entries carry an
+    optional expiry; when the compressed size exceeds ``max_bytes`` the least
+    recently used entries are evicted. The cache is safe to share between
+    threads, and WAL mode lets several client processes use the same file.
+    """
+
+    def __init__(self, path, max_bytes, max_age=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def get(self, key):
+        """Returns the cached bytes for ``key``, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT b.data, e.expires, e.created FROM entries e JOIN blobs b ON b.digest = e.digest WHERE e.key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            data, expires, created = row
+            if (expires is not None and expires <= now) or (self.max_age and created + self.max_age <= now):
+                self._delete(conn, key)
+                conn.commit()
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return zlib.decompress(data)
+
+    def put(self, key, namespace, value, ttl=None):
+        """Stores ``value`` (bytes) under ``key``; returns the number of evicted entries."""
+        data = zlib.compress(value)
+        digest = hashlib.sha256(value).hexdigest()
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR IGNORE INTO blobs (digest, data, size) VALUES (?, ?, ?)",
+                (digest, data, len(data)),
+            )
+            previous = conn.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, digest, created, accessed, expires) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, digest, now, now, now + ttl if ttl else None),
+            )
+            if previous and previous[0] != digest:
+                self._drop_orphan(conn, previous[0])
+            evicted = self._evict(conn)
+            conn.commit()
+        return evicted
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connect()
+            self._delete(conn, key)
+            conn.commit()
+
+    def clear(self, namespace=None):
+        """Removes all entries, or only those of one namespace."""
+        with self._lock:
+            conn = self._connect()
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            conn.execute("DELETE FROM blobs WHERE digest NOT IN (SELECT digest FROM entries)")
+            conn.commit()
+
+    def size(self):
+        """Returns (entry count, compressed bytes stored)."""
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            stored = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        return entries, stored
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _delete(self, conn, key):
+        """Deletes one entry; returns the bytes freed if its blob became unreferenced."""
+        row = conn.execute("SELECT digest FROM entries WHERE key = ?", (key,)).fetchone()
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return self._drop_orphan(conn, row[0]) if row else 0
+
+    def _drop_orphan(self, conn, digest):
+        row = conn.execute(
+            "SELECT size FROM blobs WHERE digest = ? AND NOT EXISTS (SELECT 1 FROM entries WHERE digest = ?)",
+            (digest, digest),
+        ).fetchone()
+        if row is None:
+            return 0
+        conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        return row[0]
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            row = conn.execute("SELECT key FROM entries ORDER BY accessed LIMIT 1").fetchone()
+            if row is None:
+                break
+            total -= self._delete(conn, row[0])
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} entries from {self.path}")
+        return evicted
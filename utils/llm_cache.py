@@ -0,0 +1,68 @@
+import json
+
+from utils.config import LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_AGE
+from utils.disk_cache import DiskCache, hash_key
+from utils.logger import get_logger
+from utils.metrics import CACHE_LOOKUPS
+
+logger = get_logger(__name__)
+
+_cache = None
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def get_llm_cache():
+    """Return singleton DiskCache holding LLM replies."""
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, max_age=LLM_CACHE_MAX_AGE)
+    return _cache
+
+
+def is_deterministic(options):
+    """Only temperature-0 calls give repeatable answers, so only those are cached."""
+    return bool(options) and options.get("temperature") == 0
+
+
+def llm_cache_key(model, messages, options):
+    """Key = hash of model, options and the full message list in canonical JSON form."""
+    def canonical(value):
+        return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    return hash_key(model, canonical(options), canonical(list(messages)))
+
+
+def get_cached_reply(model, messages, options, use_cache=True):
+    """Returns the cached reply content for an LLM call, or None."""
+    if not (use_cache and LLM_CACHE_ENABLED and is_deterministic(options)):
+        return None
+    try:
+        payload = get_llm_cache().get(llm_cache_key(model, messages, options))
+    except Exception as e:
+        logger.warning(f"LLM cache read failed: {e}")
+        return None
+    if payload is None:
+        _stats["misses"] += 1
+        CACHE_LOOKUPS.inc(cache="llm", result="miss")
+        return None
+    _stats["hits"] += 1
+    CACHE_LOOKUPS.inc(cache="llm", result="hit")
+    return payload.decode("utf-8")
+
+
+def store_reply(model, messages, options, content, use_cache=True):
+    """Caches a non-empty reply of a deterministic LLM call."""
+    if not (use_cache and LLM_CACHE_ENABLED and is_deterministic(options)) or not content:
+        return
+    try:
+        evicted = get_llm_cache().put(llm_cache_key(model, messages, options), model, content.encode("utf-8"))
+    except Exception as e:
+        logger.warning(f"LLM cache write failed: {e}")
+        return
+    _stats["stores"] += 1
+    _stats["evictions"] += evicted
+
+
+def get_llm_cache_stats():
+    """Returns LLM cache hit/miss/store/eviction counters."""
+    return dict(_stats)
@@ -1,18 +1,70 @@
+import atexit
 import logging
-import os
+import logging.handlers
+import queue
 
-def get_logger(name=None):
-    logger = logging.getLogger(name)
-    if not logger.hasHandlers():
-        logger.setLevel(logging.DEBUG)
+from utils.config import LOG_LEVEL, LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_MAX_MESSAGE_CHARS
+
+_queue_handler = None
+_listener = None
+
+
+def summarize_payload(value, limit=200):
+    """Short description of a (possibly huge) value for log lines: size plus a head."""
+    if isinstance(value, (list, tuple)):
+        # Content lists carry whole files: cut each item before formatting, stop once the head is full
+        parts, length = [], 0
+        for item in value:
+            if length >= limit:
+                break
+            text = getattr(item, "text", None)
+            part = repr(text[:limit]) if isinstance(text, str) else summarize_payload(item, limit)
+            parts.append(part)
+            length += len(part) + 2
+        head = ", ".join(parts)
+        if len(parts) == len(value) and len(head) <= limit:
+            return f"[{head}]"
+        return f"<{len(value)} items> [{head[:limit]}...]"
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= limit:
+        return text
+    return f"<{len(text)} chars> {text[:limit]}..."
+
+
+class _TruncatingQueueHandler(logging.handlers.QueueHandler):
+    """Formats on the caller's thread, cutting oversized messages before they are queued."""
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        if len(record.msg) > LOG_MAX_MESSAGE_CHARS:
+            cut = len(record.msg) - LOG_MAX_MESSAGE_CHARS
+            record.msg = f"{record.msg[:LOG_MAX_MESSAGE_CHARS]}... [truncated {cut} chars]"
+        return record
+
+
+def _get_queue_handler():
+    """Creates the shared queue handler and starts the background writer thread once."""
+    global _queue_handler, _listener
+    if _queue_handler is None:
         formatter = logging.Formatter('[%(asctime)s] %(levelname)s %(name)s: %(message)s')
         # Stream handler (console)
         # stream_handler = logging.StreamHandler()
         # stream_handler.setFormatter(formatter)
-        # logger.addHandler(stream_handler)
-        # File handler
-        log_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app.log')
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    return logger 
\ No newline at end of file
+        # File handler, rotated by size; written only by the listener thread
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+        _queue_handler = _TruncatingQueueHandler(queue.SimpleQueue())
+        _queue_handler.setFormatter(formatter)
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, file_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+    return _queue_handler
+
+
+def get_logger(name=None):
+    logger = logging.getLogger(name)
+    if not logger.hasHandlers():
+        logger.setLevel(LOG_LEVEL)
+        logger.addHandler(_get_queue_handler())
+    return logger
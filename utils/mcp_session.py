@@ -0,0 +1,156 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from utils.config import (
+    get_fastmcp_client,
+    MCP_HEARTBEAT_INTERVAL,
+    MCP_HEARTBEAT_TIMEOUT,
+    MCP_CONNECT_TIMEOUT,
+    MCP_RECONNECT_DELAY,
+)
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class MCPSession:
+    """
+    Long-lived connection around a FastMCP client.
+
+    A single runner task enters ``async with client`` and keeps it open for the
+    life of the process (transport contexts must be entered and exited by the
+    same task). While connected, the runner pings the server every
+    ``heartbeat_interval`` seconds; a failed ping or a failure reported by a
+    caller drops the connection and the runner reconnects. Any number of
+    coroutines can share the session through ``acquire()``, since MCP requests
+    are multiplexed over the one connection.
+    """
+
+    def __init__(
+        self,
+        client,
+        heartbeat_interval=MCP_HEARTBEAT_INTERVAL,
+        heartbeat_timeout=MCP_HEARTBEAT_TIMEOUT,
+        connect_timeout=MCP_CONNECT_TIMEOUT,
+        reconnect_delay=MCP_RECONNECT_DELAY,
+    ):
+        self.client = client
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.reconnects = 0
+        self._ready = asyncio.Event()
+        self._reconnect_requested = asyncio.Event()
+        self._runner = None
+        self._last_error = None
+
+    @property
+    def connected(self):
+        return self._ready.is_set() and self.client.is_connected()
+
+    def start(self):
+        """Starts the runner task (idempotent). Connection happens in the background."""
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+        return self._runner
+
+    async def wait_connected(self, timeout=None):
+        """Starts the session if needed and waits until it is connected."""
+        self.start()
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout or self.connect_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"MCP server unavailable: {self._last_error or 'connect timed out'}") from None
+
+    async def close(self):
+        """Stops the runner and closes the connection."""
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        self._ready.clear()
+
+    def request_reconnect(self):
+        """Asks the runner to drop and re-establish the connection."""
+        self._reconnect_requested.set()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Yields the connected client, waiting for a (re)connection if needed.
+        A failure inside the block that leaves the client disconnected
+        triggers a reconnect for the next caller.
+        """
+        if not self.connected:
+            await self.wait_connected()
+        try:
+            yield self.client
+        except Exception:
+            if not self.client.is_connected():
+                logger.warning("MCP connection lost during call; reconnecting.")
+                self.request_reconnect()
+            raise
+
+    async def _run(self):
+        while True:
+            try:
+                async with self.client:
+                    self._last_error = None
+                    self._reconnect_requested.clear()
+                    self._ready.set()
+                    logger.info(f"MCP session connected (reconnects: {self.reconnects}).")
+                    await self._heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._last_error = e
+                logger.warning(f"MCP session dropped: {e}")
+            finally:
+                self._ready.clear()
+            self.reconnects += 1
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _heartbeat(self):
+        """Returns when a reconnect is requested; raises when a ping fails."""
+        while True:
+            try:
+                await asyncio.wait_for(self._reconnect_requested.wait(), self.heartbeat_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.wait_for(self.client.ping(), self.heartbeat_timeout)
+
+
+_sessions = {}
+
+
+def get_mcp_session(client=None):
+    """Return the shared MCPSession for a FastMCP client (defaults to the configured singleton)."""
+    if client is None:
+        client = get_fastmcp_client()
+    session = _sessions.get(id(client))
+    if session is None or session.client is not client:
+        session = MCPSession(client)
+        _sessions[id(client)] = session
+    return session
+
+
+@asynccontextmanager
+async def connected(client=None):
+    """
+    Shared-session replacement for ``async with client: await client.ping()``.
+
+    Usage:
+        async with connected(client) as client:
+            ...
+    """
+    async with get_mcp_session(client).acquire() as session_client:
+        yield session_client
+
+
+async def close_all_sessions():
+    """Closes every session opened through get_mcp_session."""
+    for session in list(_sessions.values()):
+        await session.close()
+    _sessions.clear()
@@ -1,8 +1,21 @@
+import asyncio
 import json
-from utils.logger import get_logger
+import logging
+import re
+import time
+from utils.logger import get_logger, summarize_payload
+from utils.mcp_session import get_mcp_session
+from utils.resilience import get_tool_policy, get_circuit_breaker, is_transient, backoff_delay, hedged
+from utils.config import TOOL_SINGLE_FLIGHT, TOOL_CACHE_INVALIDATED_BY
+from utils.tool_cache import get_cached_response, store_response, tool_cache_key
+from utils.tracing import span
+from utils.metrics import TOOL_CALLS, TOOL_LATENCY, TOOL_IN_FLIGHT, TOOL_RETRIES, TOOL_HEDGES, CIRCUIT_STATE
 
 logger = get_logger(__name__)
 
+_in_flight = {}  # tool_cache_key -> _Flight
+_single_flight_stats = {"calls": 0, "collapsed": 0}
+
 
 def get_first_text(response_list):
     if not response_list:
@@ -36,23 +49,397 @@ def parse_all_json(response_list):
     return [parse_json_safe(text) for text in get_all_texts(response_list)]
 
 
-async def safe_call_tool(client, tool_name, arguments=None, timeout=None, progress_handler=None, parse_json=False):
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+# A complete JSON string, and the rest of a string up to (not including) its closing quote
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+
+
+class _ValueScanner:
+    """
+    Tracks bracket depth and string state over the text of a JSON value fed
+    in pieces, to tell when the value can be complete (``closed``) without
+    re-parsing it from the start after every piece.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self._escaped = False
+
+    @property
+    def closed(self):
+        return self.depth <= 0 and not self.in_string
+
+    def feed(self, text):
+        pos = 0
+        if self._escaped and text:
+            # The previous piece ended with a backslash inside a string
+            self._escaped = False
+            pos = 1
+        if self.in_string:
+            end = _STRING_REST.match(text, pos).end()
+            if end == len(text):
+                return
+            if text[end] == "\\":
+                self._escaped = True
+                return
+            self.in_string = False
+            pos = end + 1
+        # Drop complete strings; a quote left over opens a string that runs past this piece
+        outside = _STRING.sub("", text[pos:])
+        quote = outside.find('"')
+        if quote >= 0:
+            self.in_string = True
+            tail = outside[quote + 1:]
+            self._escaped = _STRING_REST.match(tail).end() < len(tail)
+            outside = outside[:quote]
+        self.depth += outside.count("[") + outside.count("{") - outside.count("]") - outside.count("}")
+
+
+class _JsonReader:
+    """
+    Reads consecutive JSON values from a sequence of text chunks (tool
+    content items). Values are decoded in place with raw_decode. A value cut
+    at a chunk boundary is collected until its brackets and strings close and
+    then decoded once, so decoding stays linear in the input size; tokens cut
+    at a boundary ('tr' + 'ue', '1.' + '5') are joined too. A whole top-level
+    number ending a chunk is complete: "12" and "34" are two numbers.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ""
+        self._pos = 0
+
+    def _next_chunk(self):
+        for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return None
+
+    def _fill(self):
+        chunk = self._next_chunk()
+        if chunk is None:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def skip_whitespace(self):
+        """Moves past whitespace; returns False at the end of the input."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return True
+            if not self._fill():
+                return False
+
+    def peek(self):
+        return self._buffer[self._pos]
+
+    def advance(self):
+        self._pos += 1
+
+    def _decode_spanning(self, top_level):
+        """
+        Joins chunks until the value at the read position can be complete
+        (brackets and strings closed, no token cut at the end), then decodes it.
+        """
+        parts = [self._buffer[self._pos:]]
+        scanner = _ValueScanner()
+        scanner.feed(parts[0])
+        while True:
+            if scanner.closed:
+                text = "".join(parts)
+                parts = [text]
+                try:
+                    value, end = _decoder.raw_decode(text)
+                    complete = not _number_may_continue(text, 0, end, value, top_level)
+                except json.JSONDecodeError as e:
+                    if not _ends_inside_token(text, e.pos):
+                        raise
+                    complete = False
+                if complete:
+                    self._buffer, self._pos = text, 0
+                    return value, end
+            chunk = self._next_chunk()
+            if chunk is None:
+                # End of input: decode what there is (a trailing number is complete, a cut token an error)
+                self._buffer, self._pos = "".join(parts), 0
+                return _decoder.raw_decode(self._buffer)
+            parts.append(chunk)
+            scanner.feed(chunk)
+
+    def decode(self, top_level=True):
+        """
+        Decodes the next value. Inside a container (``top_level`` False) a
+        number ending a chunk may continue in the next one.
+        """
+        if not self.skip_whitespace():
+            raise ValueError("Unexpected end of JSON input")
+        try:
+            value, end = _decoder.raw_decode(self._buffer, self._pos)
+            if _number_may_continue(self._buffer, self._pos, end, value, top_level):
+                value, end = self._decode_spanning(top_level)
+        except json.JSONDecodeError:
+            value, end = self._decode_spanning(top_level)
+        self._pos = end
+        return value
+
+
+_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+_NUMBER_CHARS = re.compile(r"[-+.eE0-9]*")
+
+
+def _ends_inside_token(text, error_pos):
+    """True when decoding ``text`` failed only because it ends partway through a token (e.g. 'tr', '-')."""
+    tail = text[error_pos:]
+    return not tail.strip() or any(literal.startswith(tail) for literal in _LITERALS)
+
+
+def _number_may_continue(text, pos, end, value, top_level):
+    """
+    True when a number decoded from ``text[pos:end]`` may be cut at the end of
+    the text: always for a partial token like '1.' or '2e', and for a whole
+    number only inside a container.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    token_end = _NUMBER_CHARS.match(text, pos).end()
+    if token_end < len(text):
+        return False
+    return end < token_end or not top_level
+
+
+def _drain(response_list):
+    """Yields the text of each item, dropping it from the list so it can be freed once parsed."""
+    for index, item in enumerate(response_list):
+        response_list[index] = None
+        yield getattr(item, "text", None)
+    response_list.clear()
+
+
+def iter_json_documents(response_list, consume=False):
+    """
+    Yields every JSON value found in the text content items, in order. A value
+    may be split across items and an item may hold several values.
+
+    Args:
+        response_list (list): Tool response content items.
+        consume (bool): Remove items from ``response_list`` while reading, so
+            already-parsed text is released early.
+    """
+    reader = _JsonReader(_drain(response_list) if consume else get_all_texts(response_list))
+    while reader.skip_whitespace():
+        yield reader.decode()
+
+
+def iter_json_records(response_list, consume=False):
+    """
+    Like iter_json_documents, but top-level arrays are streamed element by
+    element, so a huge list of records is never materialised as one object.
+    """
+    reader = _JsonReader(_drain(response_list) if consume else get_all_texts(response_list))
+    while reader.skip_whitespace():
+        if reader.peek() != "[":
+            yield reader.decode()
+            continue
+        reader.advance()
+        if reader.skip_whitespace() and reader.peek() == "]":
+            reader.advance()
+            continue
+        while True:
+            yield reader.decode(top_level=False)
+            if not reader.skip_whitespace():
+                raise ValueError("Unterminated JSON array in tool result")
+            separator = reader.peek()
+            reader.advance()
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError(f"Unexpected {separator!r} between JSON array elements")
+
+
+def parse_json_content(response_list):
+    """
+    Parses the text content items as JSON and returns the first document
+    (which may be split across items), or None when there is nothing
+    parsable. Use iter_json_documents for results holding several documents.
+    """
+    try:
+        for document in iter_json_documents(response_list):
+            return document
+    except ValueError as ex:
+        logger.error(f"JSON parsing failed: {ex}")
+    return None
+
+
+async def _call_tool_attempt(client, tool_name, arguments, timeout, progress_handler):
+    """One call to the server, bounded by ``timeout`` and waiting for a (re)connection if needed."""
+    async with asyncio.timeout(timeout):
+        async with get_mcp_session(client).acquire() as session_client:
+            with TOOL_IN_FLIGHT.track():
+                return await session_client.call_tool(
+                    tool_name,
+                    arguments,
+                    timeout=timeout,
+                    progress_handler=progress_handler
+                )
+
+
+async def call_tool_with_policy(client, tool_name, arguments=None, timeout=None, progress_handler=None):
+    """
+    Calls a tool under its TOOL_CALL_POLICIES entry: every attempt has a
+    deadline, transient failures (timeouts, dropped connections) are retried
+    with exponential backoff and jitter, slow idempotent reads are hedged, and
+    the server's circuit breaker fails calls fast while the server is down.
+    Errors reported by the tool itself are raised at once.
+
+    Args:
+        timeout (float, optional): Per-attempt deadline overriding the policy.
+    """
+    policy = get_tool_policy(tool_name)
+    timeout = timeout or policy["timeout"]
+    breaker = get_circuit_breaker("mcp")
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            if policy["hedge_after"] and policy["hedge_after"] < timeout:
+                async def call():
+                    return await _call_tool_attempt(client, tool_name, arguments, timeout, progress_handler)
+                response = await hedged(call, policy["hedge_after"], on_hedge=lambda: TOOL_HEDGES.inc(tool=tool_name))
+            else:
+                response = await _call_tool_attempt(client, tool_name, arguments, timeout, progress_handler)
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except Exception as e:
+            if not is_transient(e):
+                # The server answered; only the tool failed
+                breaker.record_success()
+                CIRCUIT_STATE.set(0, server=breaker.name)
+                raise
+            breaker.record_failure()
+            CIRCUIT_STATE.set(1 if breaker.state == "open" else 0, server=breaker.name)
+            if attempt >= policy["retries"] or breaker.state == "open":
+                raise
+            delay = backoff_delay(attempt, policy)
+            attempt += 1
+            TOOL_RETRIES.inc(tool=tool_name)
+            logger.warning(f"Tool call '{tool_name}' failed ({type(e).__name__}: {e}); "
+                           f"retry {attempt}/{policy['retries']} in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        CIRCUIT_STATE.set(0, server=breaker.name)
+        return response
+
+
+class _Flight:
+    """One shared server call and the number of callers waiting for it."""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+async def _call_and_store(client, tool_name, arguments, timeout, progress_handler):
+    response = await call_tool_with_policy(client, tool_name, arguments, timeout, progress_handler)
+    await store_response(tool_name, arguments, response)
+    return response
+
+
+async def call_tool_single_flight(client, tool_name, arguments=None, timeout=None, progress_handler=None):
     """
-    Generic safe tool caller with optional JSON parsing.
+    Calls a tool (see call_tool_with_policy) and stores the result in the tool
+    cache. Concurrent calls with the same tool and arguments share one server
+    request and all get its result (each its own copy of the content list) or
+    its error; only the first caller's progress_handler sees progress. A
+    caller being cancelled does not cancel the shared request unless it was
+    the last one waiting.
+
+    Returns:
+        tuple: (response, collapsed) - collapsed is True when the call joined
+            a request that was already in flight.
     """
+    if not TOOL_SINGLE_FLIGHT or tool_name in TOOL_CACHE_INVALIDATED_BY:
+        return await _call_and_store(client, tool_name, arguments, timeout, progress_handler), False
+
+    key = tool_cache_key(tool_name, arguments)
+    flight = _in_flight.get(key)
+    collapsed = flight is not None
+    if flight is None:
+        flight = _Flight(asyncio.ensure_future(
+            _call_and_store(client, tool_name, arguments, timeout, progress_handler)
+        ))
+        _in_flight[key] = flight
+
+        def _landed(_task, key=key, flight=flight):
+            if _in_flight.get(key) is flight:
+                del _in_flight[key]
+
+        flight.task.add_done_callback(_landed)
+        _single_flight_stats["calls"] += 1
+    else:
+        _single_flight_stats["collapsed"] += 1
+        logger.info(f"Tool call '{tool_name}' joined an identical call already in flight.")
+
+    flight.waiters += 1
     try:
-        response = await client.call_tool(
-            tool_name,
-            arguments,
-            timeout=timeout,
-            progress_handler=progress_handler
-        )
-        logger.info(f"Tool call '{tool_name}' succeeded.")
-        data = parse_first_json(response) if parse_json else response
-        return data, None
-    except Exception as e:
-        logger.error(f"Tool call '{tool_name}' failed: {e}")
-        return None, str(e)
+        # shield: one caller being cancelled must not cancel the shared request
+        response = await asyncio.shield(flight.task)
+        # Each caller gets its own list: readers may consume it (iter_json_records(consume=True))
+        return (list(response) if isinstance(response, list) else response), collapsed
+    except asyncio.CancelledError:
+        if flight.waiters == 1 and not flight.task.done():
+            flight.task.cancel()
+        raise
+    finally:
+        flight.waiters -= 1
+
+
+def get_single_flight_stats():
+    """Returns how many tool calls went to the server and how many joined one already in flight."""
+    return dict(_single_flight_stats)
+
+
+async def safe_call_tool(client, tool_name, arguments=None, timeout=None, progress_handler=None, parse_json=False, use_cache=True):
+    """
+    Generic safe tool caller with optional JSON parsing (the first JSON
+    document, which may span several content items, see parse_json_content).
+    Results of tools listed in TOOL_CACHE_POLICIES are served from / stored in
+    the on-disk tool cache unless use_cache is False. Calls to the server go
+    through call_tool_with_policy (deadline, retries, hedging, circuit breaker),
+    and identical concurrent calls share one request (call_tool_single_flight).
+    """
+    started = time.perf_counter()
+    with span(f"tool:{tool_name}", "mcp") as trace_args:
+        try:
+            response = await get_cached_response(tool_name, arguments) if use_cache else None
+            trace_args["cached"] = response is not None
+            if response is not None:
+                TOOL_CALLS.inc(tool=tool_name, status="cached")
+                logger.info(f"Tool call '{tool_name}' served from cache ({time.perf_counter() - started:.3f}s).")
+            else:
+                response, collapsed = await call_tool_single_flight(
+                    client, tool_name, arguments, timeout, progress_handler
+                )
+                trace_args["collapsed"] = collapsed
+                TOOL_CALLS.inc(tool=tool_name, status="collapsed" if collapsed else "ok")
+                TOOL_LATENCY.observe(time.perf_counter() - started, tool=tool_name)
+                logger.info(f"Tool call '{tool_name}' succeeded ({time.perf_counter() - started:.3f}s).")
+            data = parse_json_content(response) if parse_json else response
+            return data, None
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            trace_args["error"] = error
+            TOOL_CALLS.inc(tool=tool_name, status="error")
+            logger.error(f"Tool call '{tool_name}' failed after {time.perf_counter() - started:.3f}s: {error}")
+            return None, error
 
 
 async def safe_call_tool_text(client, tool_name, arguments=None, timeout=None, progress_handler=None):
@@ -68,12 +455,17 @@ async def safe_get_prompt(client, name, arguments=None):
     Calls a prompt, logs the process, returns (data, error).
     """
     logger.info(f"Getting prompt {name}")
-    try:
-        response = await client.get_prompt(name, arguments)
-        logger.info(f"Prompt '{name}' response: {response}")
-        return response, None
-    except Exception as e:
-        logger.error(f"Prompt call '{name}' failed: {e}")
-        return None, str(e)
+    started = time.perf_counter()
+    with span(f"prompt:{name}", "mcp") as trace_args:
+        try:
+            response = await client.get_prompt(name, arguments)
+            logger.info(f"Prompt '{name}' succeeded ({time.perf_counter() - started:.3f}s).")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Prompt '{name}' response: {summarize_payload(response)}")
+            return response, None
+        except Exception as e:
+            trace_args["error"] = str(e)
+            logger.error(f"Prompt call '{name}' failed: {e}")
+            return None, str(e)
 
 
@@ -1,7 +1,133 @@
+from utils.config import CHAT_CONTEXT_TOKENS, CHAT_COMPACT_TARGET, CHAT_KEEP_LAST_MESSAGES
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Σταθερό κόστος tokens ανά μήνυμα (role, διαχωριστικά)
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """Χονδρική εκτίμηση tokens (~4 χαρακτήρες ανά token)"""
+    return len(text or "") // 4 + MESSAGE_TOKEN_OVERHEAD
+
+
+class ChatHistory:
+    """
+    Ιστορικό συνομιλίας με O(1) προσθήκη και εκτίμηση tokens ανά μήνυμα.
+
+    Όταν το σύνολο ξεπεράσει το token_budget, το compact() αφαιρεί τα
+    παλαιότερα μηνύματα (κρατώντας πάντα τα keep_last τελευταία) και,
+    αν δοθεί summarizer, τα αντικαθιστά με μία σύνοψη.
+
+    Το context (π.χ. σύνοψη repository από set_context) μένει πάντα πρώτο
+    και δεν αφαιρείται ποτέ από το compact().
+    """
+
+    def __init__(self, token_budget=CHAT_CONTEXT_TOKENS, keep_last=CHAT_KEEP_LAST_MESSAGES, compact_target=CHAT_COMPACT_TARGET):
+        self.token_budget = token_budget
+        self.keep_last = keep_last
+        self.compact_target = compact_target
+        self._messages = []
+        self._tokens = []
+        self._context = None
+        self._context_tokens = 0
+        self.total_tokens = 0
+
+    def set_context(self, content, role="system"):
+        """Ορίζει (ή αντικαθιστά, ή με None αφαιρεί) το μόνιμο context μήνυμα"""
+        self.total_tokens -= self._context_tokens
+        if content:
+            self._context = {"role": role, "content": content}
+            self._context_tokens = estimate_tokens(content)
+        else:
+            self._context = None
+            self._context_tokens = 0
+        self.total_tokens += self._context_tokens
+        return self
+
+    def append(self, role, content):
+        """Προσθέτει μήνυμα στο τέλος (amortised O(1))"""
+        tokens = estimate_tokens(content)
+        self._messages.append({"role": role, "content": content})
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+        return self
+
+    def messages(self):
+        """Επιστρέφει τα μηνύματα ως λίστα (για το LLM), με το context πρώτο"""
+        if self._context:
+            return [self._context] + self._messages
+        return list(self._messages)
+
+    def needs_compaction(self):
+        return self.total_tokens > self.token_budget
+
+    async def compact(self, summarize=None):
+        """
+        Συμπτύσσει το ιστορικό ώστε να χωράει στο token_budget.
+
+        Args:
+            summarize: Προαιρετική async συνάρτηση (list of messages) -> str
+                που συνοψίζει τα μηνύματα που αφαιρούνται.
+
+        Returns:
+            int: Πλήθος μηνυμάτων που αφαιρέθηκαν.
+        """
+        if not self.needs_compaction():
+            return 0
+        target = int(self.token_budget * self.compact_target)
+        cut = 0
+        remaining = self.total_tokens
+        while remaining > target and len(self._messages) - cut > self.keep_last:
+            remaining -= self._tokens[cut]
+            cut += 1
+        if not cut:
+            logger.warning(f"History over budget ({self.total_tokens} tokens) but nothing can be dropped.")
+            return 0
+
+        dropped = self._messages[:cut]
+        self._messages = self._messages[cut:]
+        self._tokens = self._tokens[cut:]
+        self.total_tokens = remaining
+
+        summary = None
+        if summarize:
+            try:
+                summary = await summarize(dropped)
+            except Exception as e:
+                logger.error(f"History summarisation failed, dropping turns instead: {e}")
+        if summary:
+            tokens = estimate_tokens(summary)
+            self._messages.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+            self._tokens.insert(0, tokens)
+            self.total_tokens += tokens
+        logger.info(f"Compacted chat history: dropped {cut} messages, now {self.total_tokens} tokens"
+                    f"{' (summarised)' if summary else ''}.")
+        return cut
+
+    def clear(self):
+        """Αδειάζει τα μηνύματα· το context παραμένει"""
+        self._messages.clear()
+        self._tokens.clear()
+        self.total_tokens = self._context_tokens
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+
 def add_message_to_history(history, role, message):
-    """Επιστρέφει νέο history με το πρόσθετο μήνυμα"""
-    new_entry = {"role": role, "content": message}
-    return history + [new_entry]
+    """Προσθέτει το μήνυμα στο history (in place, O(1)) και το επιστρέφει"""
+    if isinstance(history, ChatHistory):
+        return history.append(role, message)
+    history.append({"role": role, "content": message})
+    return history
 
 def get_last_message(history):
     """Επιστρέφει το τελευταίο μήνυμα (ή None)"""
@@ -9,14 +135,14 @@ def get_last_message(history):
 
 def clear_history():
     """Επιστρέφει κενό history"""
-    return []
+    return ChatHistory()
 
 def get_chat_history(history):
     """Επιστρέφει όλο το history (αντιγραφή)"""
     return list(history)
 
 def history_collector(history, role="assistant"):
-    """Επιστρέφει μια συνάρτηση που προσθέτει chunks στο history_list"""    
+    """Επιστρέφει μια συνάρτηση που προσθέτει chunks στο history_list"""
     buffer = []
 
     def collect(chunk):
@@ -0,0 +1,295 @@
+import bisect
+import threading
+from contextlib import contextmanager
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Latency buckets in seconds, from local cache hits up to slow LLM replies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Returns (labels dict, value) pairs; histograms return their state dict as value."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Counts the enclosed block as in progress."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._values[key] = state
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, {"counts": list(s["counts"]), "sum": s["sum"], "count": s["count"]})
+                     for key, s in self._values.items()]
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+    def quantile(self, state, q):
+        """Estimates a quantile from bucket counts (upper bound of the bucket holding it)."""
+        if not state["count"]:
+            return None
+        rank = q * state["count"]
+        seen = 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+def _register(cls, name, documentation, labelnames, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, documentation, labelnames, **kwargs)
+            _registry[name] = metric
+        elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} is already registered with a different type or labels")
+        return metric
+
+
+def counter(name, documentation, labelnames=()):
+    """Returns the registered counter ``name``, creating it on first use."""
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    """Returns the registered gauge ``name``, creating it on first use."""
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    """Returns the registered histogram ``name``, creating it on first use."""
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+# Client metrics
+TOOL_CALLS = counter("mcp_tool_calls", "MCP tool calls by tool and status (ok, error, cached, collapsed).", ("tool", "status"))
+TOOL_LATENCY = histogram("mcp_tool_latency_seconds", "MCP tool call latency, server calls only.", ("tool",))
+TOOL_IN_FLIGHT = gauge("mcp_tool_calls_in_flight", "MCP tool calls currently waiting on the server.")
+TOOL_RETRIES = counter("mcp_tool_retries", "MCP tool calls retried after a transient failure.", ("tool",))
+TOOL_HEDGES = counter("mcp_tool_hedges", "Hedged (duplicate) MCP tool calls sent for slow reads.", ("tool",))
+CIRCUIT_STATE = gauge("mcp_circuit_open", "1 while the circuit breaker for a server is open.", ("server",))
+LLM_REQUESTS = counter("llm_requests", "LLM requests by model, kind and status (ok, error, cached).",
+                       ("model", "kind", "status"))
+LLM_LATENCY = histogram("llm_request_duration_seconds", "LLM request duration.", ("model", "kind"))
+LLM_FIRST_TOKEN = histogram("llm_time_to_first_token_seconds", "Streaming time to first token.", ("model",))
+LLM_TOKENS_PER_SECOND = histogram("llm_tokens_per_second", "LLM generation speed.", ("model",),
+                                  buckets=RATE_BUCKETS)
+LLM_LOAD_TIME = histogram("llm_model_load_seconds", "Time Ollama spent loading the model (near 0 when resident).",
+                          ("model", "kind"))
+LLM_INFERENCE_TIME = histogram("llm_inference_seconds", "Ollama prompt evaluation and generation time, without model load.",
+                               ("model", "kind"))
+LLM_IN_FLIGHT = gauge("llm_requests_in_flight", "LLM requests currently running.", ("model",))
+LLM_HOST_REQUESTS = counter("llm_host_requests", "LLM requests per Ollama host by status (ok, error, failover).", ("host", "status"))
+LLM_HOST_OUTSTANDING = gauge("llm_host_outstanding_requests", "LLM requests in flight per Ollama host.", ("host",))
+LLM_HOST_UP = gauge("llm_host_up", "1 while an Ollama host is considered healthy.", ("host",))
+SAMPLING_REQUESTS = counter("mcp_sampling_requests", "Sampling requests by how they were served.", ("result",))
+SAMPLING_WAIT = histogram("mcp_sampling_queue_wait_seconds", "Time sampling requests waited for an LLM slot.")
+CACHE_LOOKUPS = counter("cache_lookups", "Disk cache lookups by cache and result (hit, miss).", ("cache", "result"))
+
+
+def tokens_per_second(response):
+    """Generation speed from an Ollama reply's eval_count / eval_duration, or None."""
+    try:
+        count, duration = response["eval_count"], response["eval_duration"]
+    except Exception:
+        return None
+    if not count or not duration:
+        return None
+    return count / (duration / 1e9)
+
+
+def model_timings(response):
+    """(load seconds, inference seconds) from an Ollama reply's durations, or (None, None)."""
+    try:
+        load, total = response["load_duration"], response["total_duration"]
+    except Exception:
+        return None, None
+    if load is None or not total:
+        return None, None
+    return load / 1e9, max(0, total - load) / 1e9
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra=None):
+    pairs = list(labels.items()) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_openmetrics():
+    """Renders every registered metric in the OpenMetrics text format."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+        for labels, value in metric.samples():
+            if metric.type == "counter":
+                lines.append(f"{metric.name}_total{_labels(labels)} {_number(value)}")
+            elif metric.type == "gauge":
+                lines.append(f"{metric.name}{_labels(labels)} {_number(value)}")
+            else:
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), value["counts"]):
+                    cumulative += count
+                    lines.append(f"{metric.name}_bucket{_labels(labels, {'le': _number(bound)})} {cumulative}")
+                lines.append(f"{metric.name}_sum{_labels(labels)} {_number(value['sum'])}")
+                lines.append(f"{metric.name}_count{_labels(labels)} {value['count']}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def format_stats():
+    """Human-readable summary of all metrics, for the CLI 'stats' command."""
+    from tabulate import tabulate
+
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+
+    def label_text(labels):
+        return ", ".join(f"{k}={v}" for k, v in labels.items())
+
+    values, latencies = [], []
+    for metric in metrics:
+        for labels, value in metric.samples():
+            if metric.type == "histogram":
+                latencies.append([
+                    metric.name, label_text(labels), value["count"],
+                    value["sum"] / value["count"] if value["count"] else None,
+                    metric.quantile(value, 0.5), metric.quantile(value, 0.95),
+                ])
+            else:
+                values.append([metric.name, label_text(labels), value])
+
+    hits = {}
+    for labels, value in CACHE_LOOKUPS.samples():
+        hits.setdefault(labels["cache"], {"hit": 0, "miss": 0})[labels["result"]] += value
+    rates = [[cache, f"{c['hit'] / (c['hit'] + c['miss']):.1%}", c["hit"] + c["miss"]]
+             for cache, c in sorted(hits.items()) if c["hit"] + c["miss"]]
+
+    if not values and not latencies:
+        return "No metrics recorded yet."
+    sections = []
+    if values:
+        sections.append(tabulate(values, headers=["metric", "labels", "value"]))
+    if latencies:
+        sections.append(tabulate(latencies, headers=["histogram", "labels", "count", "mean", "p50 <=", "p95 <="],
+                                 floatfmt=".3f"))
+    if rates:
+        sections.append(tabulate(rates, headers=["cache", "hit rate", "lookups"]))
+    return "\n\n".join(sections)
+
+
+async def start_metrics_server(host, port):
+    """
+    Serves render_openmetrics() at http://host:port/metrics.
+
+    Returns:
+        aiohttp.web.AppRunner or None: Call ``await runner.cleanup()`` to stop;
+            None if the server could not be started.
+    """
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(
+            body=render_openmetrics().encode("utf-8"),
+            headers={"Content-Type": "application/openmetrics-text; version=1.0.0; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+
+from utils.config import (
+    TOOL_CALL_DEFAULT_POLICY,
+    TOOL_CALL_POLICIES,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling the server while the circuit breaker is open."""
+
+
+def get_tool_policy(tool_name):
+    """TOOL_CALL_DEFAULT_POLICY overlaid with the tool's entry in TOOL_CALL_POLICIES."""
+    return {**TOOL_CALL_DEFAULT_POLICY, **TOOL_CALL_POLICIES.get(tool_name, {})}
+
+
+def is_transient(error):
+    """
+    True for failures worth retrying: timeouts, dropped connections and
+    transport errors. Errors reported by the tool itself are not transient.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError, OSError, EOFError)):
+        return True
+    name = type(error).__name__
+    if name == "McpError":
+        # Request timeouts come back as McpError with HTTP 408
+        return getattr(getattr(error, "error", None), "code", None) == 408
+    if name in ("ClosedResourceError", "BrokenResourceError", "EndOfStream") or name.endswith("TransportError"):
+        return True
+    return isinstance(error, RuntimeError) and "not connected" in str(error).lower()
+
+
+def backoff_delay(attempt, policy):
+    """Exponential backoff with jitter: 50-100% of backoff * 2**attempt, capped at max_backoff."""
+    delay = min(policy["max_backoff"], policy["backoff"] * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the server keeps failing.
+
+    After ``failure_threshold`` consecutive transient failures the circuit
+    opens and calls are rejected for ``reset_timeout`` seconds. Then one trial
+    call is let through (half-open); its success closes the circuit, its
+    failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        """Raises CircuitOpenError unless a call may go to the server now."""
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_running):
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(f"Circuit '{self.name}' is open after {self.failures} failures; "
+                                   f"retrying in {retry_in:.0f}s")
+        if state == "half-open":
+            self._trial_running = True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit '{self.name}' closed.")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"Circuit '{self.name}' opened after {self.failures} consecutive failures.")
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """A call that was cancelled says nothing about the server; free the trial slot."""
+        self._trial_running = False
+
+
+async def hedged(call, hedge_after, on_hedge=None):
+    """
+    Runs ``call()``; if it has not finished after ``hedge_after`` seconds,
+    starts a second identical call and returns whichever succeeds first (the
+    other is cancelled). Only for idempotent calls.
+    """
+    tasks = {asyncio.ensure_future(call())}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            logger.info(f"Hedging a call still running after {hedge_after}s.")
+            if on_hedge:
+                on_hedge()
+            tasks.add(asyncio.ensure_future(call()))
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+_breakers = {}
+
+
+def get_circuit_breaker(name):
+    """Shared CircuitBreaker per server name."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(name)
+        _breakers[name] = breaker
+    return breaker
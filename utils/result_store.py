@@ -0,0 +1,246 @@
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.config import RESULT_STORE_PATH
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    repository TEXT NOT NULL,
+    filename   TEXT NOT NULL,
+    language   TEXT,
+    info       TEXT NOT NULL,
+    updated    REAL NOT NULL,
+    PRIMARY KEY (repository, filename)
+);
+CREATE TABLE IF NOT EXISTS flows (
+    repository TEXT NOT NULL,
+    filename   TEXT NOT NULL,
+    program_id TEXT,
+    language   TEXT,
+    flow       TEXT NOT NULL,
+    updated    REAL NOT NULL,
+    PRIMARY KEY (repository, filename)
+);
+CREATE TABLE IF NOT EXISTS edges (
+    repository TEXT NOT NULL,
+    filename   TEXT NOT NULL,
+    program_id TEXT,
+    source     TEXT NOT NULL,
+    target     TEXT NOT NULL,
+    kind       TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_language ON documents(language COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS flows_program ON flows(program_id COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS flows_language ON flows(language COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS edges_file ON edges(repository, filename);
+CREATE INDEX IF NOT EXISTS edges_program ON edges(program_id COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS edges_source ON edges(source COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS edges_target ON edges(target COLLATE NOCASE);
+"""
+
+# Key pairs under which flow JSON names the two ends of an edge
+_EDGE_KEYS = (("from", "to"), ("source", "target"), ("caller", "callee"))
+
+
+def flow_edges(flow):
+    """
+    Yields (source, target, kind) for every edge in an extracted flow or an
+    edge list (find_edges): items of any list in the flow (e.g. 'flow_graph')
+    that name both ends of a call, PERFORM or other transfer.
+    """
+    if isinstance(flow, list):
+        lists = [flow]
+    elif isinstance(flow, dict):
+        lists = [value for value in flow.values() if isinstance(value, list)]
+    else:
+        return
+    for items in lists:
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            for source_key, target_key in _EDGE_KEYS:
+                source, target = item.get(source_key), item.get(target_key)
+                if isinstance(source, str) and isinstance(target, str) and source and target:
+                    yield source, target, item.get("type") or item.get("kind")
+                    break
+
+
+class ResultStore:
+    """
+    Queryable SQLite store of workflow results: document info and extracted
+    flows as JSON, plus the flow edges in an indexed table, so questions like
+    "which programs call X" are answered without re-running extraction.
+    Safe to share between threads; WAL mode lets other processes read it.
+    """
+
+    def __init__(self, path=RESULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    def save_document(self, repository, filename, info):
+        """Stores (replaces) the document info of a file."""
+        language = info.get("language") if isinstance(info, dict) else None
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (repository, filename, language, info, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (repository, filename, language, json.dumps(info, ensure_ascii=False, default=str), time.time()),
+            )
+            conn.commit()
+
+    def save_flow(self, repository, filename, flow, language=None):
+        """Stores (replaces) the flow of a file and its edges."""
+        program_id = flow.get("program_id") if isinstance(flow, dict) else None
+        language = language or (flow.get("language") if isinstance(flow, dict) else None)
+        edges = [
+            (repository, filename, program_id or filename, source, target, kind)
+            for source, target, kind in flow_edges(flow)
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO flows (repository, filename, program_id, language, flow, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (repository, filename, program_id, language,
+                 json.dumps(flow, ensure_ascii=False, default=str), time.time()),
+            )
+            conn.execute("DELETE FROM edges WHERE repository = ? AND filename = ?", (repository, filename))
+            conn.executemany(
+                "INSERT INTO edges (repository, filename, program_id, source, target, kind) VALUES (?, ?, ?, ?, ?, ?)",
+                edges,
+            )
+            conn.commit()
+
+    def get_document(self, repository, filename):
+        rows = self._query("SELECT info FROM documents WHERE repository = ? AND filename = ?", (repository, filename))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_flow(self, repository, filename):
+        rows = self._query("SELECT flow FROM flows WHERE repository = ? AND filename = ?", (repository, filename))
+        return json.loads(rows[0][0]) if rows else None
+
+    def callers(self, name, repository=None):
+        """Edges whose target is ``name`` (program or paragraph, case-insensitive)."""
+        sql = "SELECT repository, program_id, source, kind FROM edges WHERE target = ? COLLATE NOCASE"
+        parameters = [name]
+        if repository:
+            sql += " AND repository = ?"
+            parameters.append(repository)
+        return self._query(sql + " ORDER BY repository, program_id, source", parameters)
+
+    def callees(self, name, repository=None):
+        """Edges leaving ``name``: a program (all its edges) or a paragraph."""
+        sql = ("SELECT repository, program_id, source, target, kind FROM edges "
+               "WHERE (program_id = ? COLLATE NOCASE OR source = ? COLLATE NOCASE)")
+        parameters = [name, name]
+        if repository:
+            sql += " AND repository = ?"
+            parameters.append(repository)
+        return self._query(sql + " ORDER BY repository, program_id, source, target", parameters)
+
+    def programs(self, repository=None, language=None):
+        """Files with a stored flow, optionally filtered by repository and language."""
+        sql = "SELECT repository, filename, program_id, language, updated FROM flows WHERE 1 = 1"
+        parameters = []
+        if repository:
+            sql += " AND repository = ?"
+            parameters.append(repository)
+        if language:
+            sql += " AND language = ? COLLATE NOCASE"
+            parameters.append(language)
+        return self._query(sql + " ORDER BY repository, filename", parameters)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store = None
+
+
+def get_result_store():
+    """Return singleton ResultStore."""
+    global _store
+    if _store is None:
+        _store = ResultStore()
+    return _store
+
+
+# name -> (ResultStore method, headers of its rows, usage)
+QUERIES = {
+    "callers": ("callers", ["repository", "program", "from", "type"], "callers <name> [repository]"),
+    "callees": ("callees", ["repository", "program", "from", "to", "type"], "callees <name> [repository]"),
+    "programs": ("programs", ["repository", "filename", "program", "language", "updated"],
+                 "programs [repository] [language]"),
+    "flow": ("get_flow", None, "flow <repository> <filename>"),
+    "document": ("get_document", None, "document <repository> <filename>"),
+}
+
+
+def run_query(name, *arguments):
+    """
+    Runs one of QUERIES against the result store.
+
+    Returns:
+        Rows (list of tuples) for table queries, the stored JSON for flow /
+        document, or None when nothing is stored.
+    """
+    if name not in QUERIES:
+        raise ValueError(f"Unknown query '{name}' (expected {', '.join(QUERIES)})")
+    method, _, usage = QUERIES[name]
+    function = getattr(get_result_store(), method)
+    try:
+        inspect.signature(function).bind(*arguments)
+    except TypeError:
+        raise ValueError(f"Usage: query {usage}") from None
+    return function(*arguments)
+
+
+def format_query(text):
+    """Runs a CLI query ('callers X', 'programs repo COBOL', ...) and formats the result as text."""
+    from tabulate import tabulate
+
+    parts = text.split()
+    if not parts:
+        return "Queries: " + "; ".join(usage for _, _, usage in QUERIES.values())
+    started = time.perf_counter()
+    try:
+        result = run_query(parts[0].lower(), *parts[1:])
+    except ValueError as e:
+        return str(e)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    headers = QUERIES[parts[0].lower()][1]
+    if not result:
+        return f"No results ({elapsed_ms:.1f} ms)."
+    if headers is None:
+        return json.dumps(result, indent=2, ensure_ascii=False)
+    if "updated" in headers:
+        index = headers.index("updated")
+        result = [row[:index] + (time.strftime("%Y-%m-%d %H:%M", time.localtime(row[index])),) + row[index + 1:]
+                  for row in result]
+    return tabulate(result, headers=headers) + f"\n{len(result)} rows ({elapsed_ms:.1f} ms)"
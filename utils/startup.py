@@ -0,0 +1,72 @@
+import importlib
+import subprocess
+import sys
+
+from utils.config import BASE_DIR
+
+# Client libraries that are slow to import; loaded after the prompt is shown
+DEFERRED_MODULES = ("fastmcp", "ollama", "aiohttp.web")
+
+
+def preload(modules=DEFERRED_MODULES):
+    """Imports ``modules``; meant to run in a worker thread (asyncio.to_thread)."""
+    for name in modules:
+        importlib.import_module(name)
+
+
+def measure_imports(code):
+    """
+    Runs ``code`` in a fresh interpreter with ``-X importtime``.
+
+    Returns:
+        list: (module, depth, self_ms, cumulative_ms) per imported module, in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, self_us / 1000, cumulative_us / 1000))
+    return rows
+
+
+def import_report(entry="main", deferred=DEFERRED_MODULES, top=15):
+    """
+    Import-time breakdown for a cold start of ``entry``, plus what the deferred
+    client libraries cost when they are loaded afterwards.
+    """
+    from tabulate import tabulate
+
+    code = f"import {entry}\n" + "".join(f"import {name}\n" for name in deferred)
+    rows = measure_imports(code)
+    names = [name for name, _, _, _ in rows]
+    if entry not in names:
+        return f"Could not measure imports of '{entry}'."
+    boundary = names.index(entry) + 1
+    before_prompt, after_prompt = rows[:boundary], rows[boundary:]
+
+    # Self time grouped by top-level package shows who is responsible
+    packages = {}
+    for name, _, self_ms, _ in before_prompt:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_ms
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    deferred_rows = [(name, cumulative) for name, depth, _, cumulative in after_prompt if depth == 0]
+
+    lines = [
+        f"Imports before the prompt ({entry}): {sum(p for _, p in packages.items()):.1f} ms",
+        tabulate(heaviest, headers=["package", "self ms"], floatfmt=".1f"),
+        "",
+        f"Deferred imports (loaded in the background): {sum(c for _, c in deferred_rows):.1f} ms",
+        tabulate(deferred_rows, headers=["module", "cumulative ms"], floatfmt=".1f"),
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,116 @@
+import asyncio
+import json
+from collections import defaultdict
+
+from utils.config import (
+    TOOL_CACHE_ENABLED,
+    TOOL_CACHE_PATH,
+    TOOL_CACHE_MAX_BYTES,
+    TOOL_CACHE_POLICIES,
+    TOOL_CACHE_INVALIDATED_BY,
+)
+from utils.disk_cache import DiskCache, hash_key
+from utils.logger import get_logger
+from utils.metrics import CACHE_LOOKUPS
+
+logger = get_logger(__name__)
+
+_cache = None
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+
+
+def get_tool_cache():
+    """Return singleton DiskCache holding MCP tool results."""
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(TOOL_CACHE_PATH, TOOL_CACHE_MAX_BYTES)
+    return _cache
+
+
+def is_cacheable(tool_name):
+    """Only tools listed in TOOL_CACHE_POLICIES are cached; a TTL of 0 opts a tool out."""
+    return TOOL_CACHE_ENABLED and TOOL_CACHE_POLICIES.get(tool_name, 0) != 0
+
+
+def tool_cache_key(tool_name, arguments):
+    """Key = hash of the tool name and its arguments in canonical JSON form."""
+    canonical = json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hash_key(tool_name, canonical)
+
+
+def _serialize(response):
+    """Encodes a tool response (list of text content items); None if it is empty or holds other content."""
+    items = []
+    for item in response or []:
+        text = getattr(item, "text", None)
+        if getattr(item, "type", "text") != "text" or text is None:
+            return None
+        items.append(text)
+    if not any(items):
+        return None
+    return json.dumps(items, ensure_ascii=False).encode("utf-8")
+
+
+def _deserialize(payload):
+    from mcp.types import TextContent
+
+    return [TextContent(type="text", text=text) for text in json.loads(payload)]
+
+
+async def get_cached_response(tool_name, arguments):
+    """Returns the cached response for a tool call, or None on a miss."""
+    if not is_cacheable(tool_name):
+        return None
+    try:
+        payload = await asyncio.to_thread(get_tool_cache().get, tool_cache_key(tool_name, arguments))
+    except Exception as e:
+        logger.warning(f"Tool cache read failed for '{tool_name}': {e}")
+        return None
+    if payload is None:
+        _stats[tool_name]["misses"] += 1
+        CACHE_LOOKUPS.inc(cache="tool", result="miss")
+        return None
+    _stats[tool_name]["hits"] += 1
+    CACHE_LOOKUPS.inc(cache="tool", result="hit")
+    return _deserialize(payload)
+
+
+async def store_response(tool_name, arguments, response):
+    """Caches a successful tool response according to the tool's policy."""
+    if tool_name in TOOL_CACHE_INVALIDATED_BY:
+        try:
+            await invalidate()
+        except Exception as e:
+            logger.warning(f"Tool cache invalidation after '{tool_name}' failed: {e}")
+        return
+    if not is_cacheable(tool_name):
+        return
+    payload = _serialize(response)
+    if payload is None:
+        return
+    try:
+        evicted = await asyncio.to_thread(
+            get_tool_cache().put,
+            tool_cache_key(tool_name, arguments),
+            tool_name,
+            payload,
+            TOOL_CACHE_POLICIES.get(tool_name),
+        )
+    except Exception as e:
+        logger.warning(f"Tool cache write failed for '{tool_name}': {e}")
+        return
+    _stats[tool_name]["stores"] += 1
+    _stats[tool_name]["evictions"] += evicted
+
+
+async def invalidate(tool_name=None):
+    """Drops cached results (all tools, or one tool)."""
+    if not TOOL_CACHE_ENABLED:
+        return
+    logger.info(f"Invalidating tool cache ({tool_name or 'all tools'})")
+    await asyncio.to_thread(get_tool_cache().clear, tool_name)
+
+
+def get_cache_stats():
+    """Returns hit/miss/store/eviction counters per tool."""
+    return {tool: dict(counts) for tool, counts in _stats.items()}
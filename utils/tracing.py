@@ -0,0 +1,128 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_events = None
+_origin = 0.0
+_lanes = {}
+_lanes_lock = threading.Lock()
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def tracing_enabled():
+    return _events is not None
+
+
+def start_tracing():
+    """Starts collecting spans (clears anything collected before)."""
+    global _events, _origin
+    _events = []
+    _origin = time.perf_counter()
+    _lanes.clear()
+    logger.info("Tracing started.")
+
+
+def stop_tracing(path):
+    """
+    Stops collecting and writes the spans as a Chrome trace (Trace Event
+    Format, loadable in chrome://tracing and ui.perfetto.dev).
+
+    Returns:
+        int: Number of events written.
+    """
+    global _events
+    if _events is None:
+        return 0
+    events, _events = _events, None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    logger.info(f"Wrote {len(events)} trace events to {path}")
+    return len(events)
+
+
+def _lane():
+    """
+    Trace lane (tid) for the caller: one per asyncio task, or per thread
+    outside the event loop, so concurrent spans never overlap on a lane.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    key = id(task) if task is not None else ("thread", threading.get_ident())
+    with _lanes_lock:
+        lane = _lanes.get(key)
+        if lane is None:
+            lane = len(_lanes) + 1
+            _lanes[key] = lane
+            label = task.get_name() if task is not None else threading.current_thread().name
+            _events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": lane, "args": {"name": label}})
+    return lane
+
+
+def record_span(name, category, started, ended, **args):
+    """Adds a finished span measured with time.perf_counter() values."""
+    if _events is None:
+        return
+    parent = _current_span.get()
+    if parent:
+        args.setdefault("parent", parent)
+    _events.append({
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": (started - _origin) * 1e6,
+        "dur": (ended - started) * 1e6,
+        "pid": os.getpid(),
+        "tid": _lane(),
+        "args": args,
+    })
+
+
+@contextmanager
+def span(name, category="client", **args):
+    """
+    Times the enclosed block as a trace span. Spans opened inside it (also in
+    tasks it spawns) record it as their parent. No-op when tracing is off.
+    The yielded dict can be used to attach extra args before the span ends.
+    """
+    if _events is None:
+        yield args
+        return
+    token = _current_span.set(name)
+    started = time.perf_counter()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        record_span(name, category, started, time.perf_counter(), **args)
+
+
+def traced(name=None, category="client"):
+    """Decorator form of span() for async functions."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(span_name, category):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import time
+
+from utils.logger import get_logger
+from utils.prompts_utils import print_agent
+from utils.tracing import span
+from workflows.engine import run_steps
+
+logger = get_logger(__name__)
+
+
+def load_checkpoint(output_path):
+    """
+    Reads an existing batch output file and returns the filenames that
+    already completed successfully. Truncated or invalid lines (e.g. from a
+    crash mid-write) are ignored, so those files are simply redone.
+    """
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("status") == "ok":
+                finished.add(record.get("filename"))
+    return finished
+
+
+class _ResultWriter:
+    """Appends one JSON line per finished file and syncs it to disk (in a worker thread) immediately."""
+
+    def __init__(self, output_path):
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(output_path, "a", encoding="utf-8")
+        self._lock = asyncio.Lock()
+
+    async def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        async with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+async def run_batch(client, repo_name, filenames, steps, output_key, output_path, concurrency, name="batch"):
+    """
+    Runs a step workflow over many files with bounded concurrency.
+
+    Results are appended to ``output_path`` (JSON lines) as each file
+    finishes; the same file is the checkpoint, so a re-run skips files that
+    already have an "ok" record and retries the rest.
+
+    Args:
+        client: Connected FastMCP client.
+        repo_name (str): Repository name, passed to every step as 'repo_name'.
+        filenames (list): Files to process.
+        steps (list): Step definitions for run_steps.
+        output_key (str): Step whose output is stored as the file's result.
+        output_path (str): JSONL output/checkpoint file.
+        concurrency (int): Maximum number of files processed at once.
+        name (str): Workflow name used in trace spans.
+
+    Returns:
+        dict: Counts of 'ok', 'error' and 'skipped' files plus 'elapsed' seconds.
+    """
+    finished = load_checkpoint(output_path)
+    todo = [filename for filename in filenames if filename not in finished]
+    summary = {"ok": 0, "error": 0, "skipped": len(filenames) - len(todo), "elapsed": 0.0}
+    if summary["skipped"]:
+        print_agent(f"Resuming: {summary['skipped']} of {len(filenames)} files already done.")
+
+    queue = asyncio.Queue()
+    for filename in todo:
+        queue.put_nowait(filename)
+
+    writer = _ResultWriter(output_path)
+    started = time.perf_counter()
+
+    async def worker():
+        while True:
+            try:
+                filename = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            timings = {}
+            context, error = await run_steps(
+                client, steps, {"repo_name": repo_name, "filename": filename}, timings, name=name
+            )
+            record = {"repository": repo_name, "filename": filename, "timings": timings}
+            if error:
+                record.update({"status": "error", "error": error})
+                summary["error"] += 1
+            else:
+                record.update({"status": "ok", "result": context[output_key]})
+                summary["ok"] += 1
+            await writer.write(record)
+            done = summary["ok"] + summary["error"]
+            print_agent(f"[{done}/{len(todo)}] {filename}: {record['status']} ({timings['total']:.1f}s)")
+
+    workers = []
+    try:
+        with span(f"batch:{name}", "workflow", repository=repo_name, files=len(todo), concurrency=concurrency):
+            workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(todo))))]
+            await asyncio.gather(*workers)
+    finally:
+        # A failed or cancelled batch stops every worker before the writer is closed under them
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        writer.close()
+        summary["elapsed"] = time.perf_counter() - started
+
+    logger.info(f"Batch {repo_name}: {summary}")
+    return summary
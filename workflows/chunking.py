@@ -0,0 +1,163 @@
+import json
+import re
+
+# Boundary priorities: a chunk preferably ends before a division, then a section, then a paragraph
+DIVISION, SECTION, PARAGRAPH = 3, 2, 1
+
+_COBOL_DIVISION = re.compile(r"^[A-Z][A-Z0-9-]*\s+DIVISION\b", re.IGNORECASE)
+_COBOL_SECTION = re.compile(r"^[A-Z0-9][A-Z0-9-]*\s+SECTION\s*\.", re.IGNORECASE)
+_COBOL_PARAGRAPH = re.compile(r"^[A-Z0-9][A-Z0-9-]*\s*\.\s*$", re.IGNORECASE)
+_JCL_STEP = re.compile(r"^//[A-Z0-9@#$]+\s+(JOB|EXEC|PROC)\b", re.IGNORECASE)
+
+
+def _cobol_code(line):
+    """
+    Returns (area A text, starts in area A) for a COBOL line, or (None, False)
+    for comments. Fixed format: columns 1-6 sequence, 7 indicator, 8-11 area A.
+    """
+    if len(line) > 6 and (line[:6].isdigit() or line[:6].isspace()):
+        if line[6] in "*/":
+            return None, False
+        code = line[7:]
+    else:
+        code = line
+    stripped = code.lstrip()
+    return stripped, len(code) - len(stripped) < 4
+
+
+def cobol_boundary(line):
+    """Boundary priority of a COBOL source line (0 = not a boundary)."""
+    code, area_a = _cobol_code(line)
+    if not code:
+        return 0
+    if _COBOL_DIVISION.match(code):
+        return DIVISION
+    if _COBOL_SECTION.match(code):
+        return SECTION
+    if area_a and _COBOL_PARAGRAPH.match(code):
+        return PARAGRAPH
+    return 0
+
+
+def jcl_boundary(line):
+    return SECTION if _JCL_STEP.match(line) else 0
+
+
+def blank_line_boundary(line):
+    return PARAGRAPH if not line.strip() else 0
+
+
+BOUNDARIES = {
+    "cobol": cobol_boundary,
+    "jcl": jcl_boundary,
+}
+
+
+def _cobol_header(lines):
+    """IDENTIFICATION DIVISION lines (PROGRAM-ID etc.), repeated in every chunk for context."""
+    header = []
+    for line in lines:
+        if cobol_boundary(line) == DIVISION and header:
+            break
+        header.append(line)
+    text = "".join(header)
+    return text if "PROGRAM-ID" in text.upper() and len(text) <= 2000 else ""
+
+
+def _split_lines(lines, max_chars):
+    """Splits a run of lines that is larger than max_chars at line boundaries."""
+    pieces, current, size = [], [], 0
+    for line in lines:
+        if current and size + len(line) > max_chars:
+            pieces.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def split_source(source, language, max_chars):
+    """
+    Splits source code into chunks of at most ``max_chars`` at language-aware
+    boundaries (COBOL divisions/sections/paragraphs, JCL steps, otherwise
+    blank lines). Sources that fit are returned as a single chunk. For COBOL,
+    the identification lines are repeated at the top of every later chunk.
+
+    Returns:
+        list: Source chunks, in order.
+    """
+    if len(source) <= max_chars:
+        return [source]
+    lines = source.splitlines(keepends=True)
+    boundary = BOUNDARIES.get((language or "").strip().lower(), blank_line_boundary)
+    header = _cobol_header(lines) if boundary is cobol_boundary else ""
+    budget = max(max_chars - len(header), max_chars // 2)
+
+    # Units run from one boundary line to the next
+    units, current = [], []
+    for line in lines:
+        if current and boundary(line):
+            units.append(current)
+            current = []
+        current.append(line)
+    if current:
+        units.append(current)
+
+    chunks, pending, size = [], [], 0
+    for unit in units:
+        unit_size = sum(len(line) for line in unit)
+        if pending and size + unit_size > budget:
+            chunks.append("".join(pending))
+            pending, size = [], 0
+        if unit_size > budget:
+            chunks.extend(_split_lines(unit, budget))
+            continue
+        pending.extend(unit)
+        size += unit_size
+    if pending:
+        chunks.append("".join(pending))
+
+    if header:
+        chunks = [chunks[0]] + [chunk if chunk.startswith(header) else header + chunk for chunk in chunks[1:]]
+    return chunks
+
+
+def _merge_lists(values):
+    merged, seen = [], set()
+    for value in values:
+        for item in value:
+            key = json.dumps(item, sort_keys=True, default=str)
+            if key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return merged
+
+
+def merge_flows(partials):
+    """
+    Merges the flow JSON extracted from each chunk into one result: lists are
+    concatenated in chunk order without duplicates, nested objects are merged
+    recursively and for scalars the first non-empty value wins.
+    """
+    partials = [p for p in partials if p]
+    if not partials:
+        return None
+    if len(partials) == 1:
+        return partials[0]
+    if not all(isinstance(p, dict) for p in partials):
+        return _merge_lists(p if isinstance(p, list) else [p] for p in partials)
+
+    merged = {}
+    for key in dict.fromkeys(k for p in partials for k in p):
+        values = [p[key] for p in partials if p.get(key) not in (None, "", [], {})]
+        if not values:
+            merged[key] = partials[0].get(key)
+        elif all(isinstance(v, list) for v in values):
+            merged[key] = _merge_lists(values)
+        elif all(isinstance(v, dict) for v in values):
+            merged[key] = merge_flows(values)
+        else:
+            merged[key] = values[0]
+    return merged
@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+from utils.logger import get_logger
+from utils.mcp_tools_helper import safe_call_tool
+from utils.tracing import span
+
+logger = get_logger(__name__)
+
+
+class WorkflowError(Exception):
+    """Raised by a step when it cannot run or its result is unusable."""
+
+
+def tool_step(name, tool, arguments, inputs=(), parse_json=False, output=None, description=None):
+    """
+    Declares a workflow step that calls an MCP tool.
+
+    Args:
+        name (str): Step name; its output is stored in the context under this key.
+        tool (str): MCP tool to call through safe_call_tool.
+        arguments (callable): Builds the tool arguments from the context
+            (workflow params plus outputs of the steps listed in ``inputs``).
+        inputs (iterable): Names of the steps this step depends on.
+        parse_json (bool): Parse the text content of the response as JSON.
+        output (callable, optional): Post-processes the raw tool result.
+        description (str, optional): Used in error messages ("Failed to <description>").
+
+    Returns:
+        dict: Step definition for run_steps.
+    """
+    return {
+        "name": name,
+        "tool": tool,
+        "arguments": arguments,
+        "inputs": tuple(inputs),
+        "parse_json": parse_json,
+        "output": output,
+        "function": None,
+        "description": description or f"run {tool}",
+    }
+
+
+def function_step(name, function, inputs=(), description=None):
+    """
+    Declares a workflow step implemented in Python, for work that is more
+    than one tool call (e.g. fan-out over chunks).
+
+    Args:
+        name (str): Step name; its output is stored in the context under this key.
+        function (callable): ``async function(client, context)`` returning the
+            step output; raise WorkflowError (or return a falsy value) on failure.
+        inputs (iterable): Names of the steps this step depends on.
+        description (str, optional): Used in error messages ("Failed to <description>").
+
+    Returns:
+        dict: Step definition for run_steps.
+    """
+    return {
+        "name": name,
+        "tool": None,
+        "arguments": None,
+        "inputs": tuple(inputs),
+        "parse_json": False,
+        "output": None,
+        "function": function,
+        "description": description or f"run {name}",
+    }
+
+
+def _check_steps(steps, params):
+    """Validates step names and dependencies, rejecting unknown inputs and cycles."""
+    names = [step["name"] for step in steps]
+    if len(set(names)) != len(names):
+        raise WorkflowError(f"Duplicate step names: {names}")
+    known = set(names)
+    for step in steps:
+        unknown = [dep for dep in step["inputs"] if dep not in known]
+        if unknown:
+            raise WorkflowError(f"Step '{step['name']}' depends on unknown steps {unknown}")
+        if step["name"] in params:
+            raise WorkflowError(f"Step '{step['name']}' shadows a workflow parameter")
+
+    resolved = set()
+    remaining = list(steps)
+    while remaining:
+        ready = [step for step in remaining if set(step["inputs"]) <= resolved]
+        if not ready:
+            raise WorkflowError(f"Dependency cycle between steps {[s['name'] for s in remaining]}")
+        resolved.update(step["name"] for step in ready)
+        remaining = [step for step in remaining if step["name"] not in resolved]
+
+
+async def _run_step(client, step, context, timings):
+    started = time.perf_counter()
+    try:
+        with span(f"step:{step['name']}", "workflow", tool=step["tool"]):
+            if step["function"]:
+                data, error = await step["function"](client, context), None
+            else:
+                arguments = step["arguments"](context)
+                data, error = await safe_call_tool(client, step["tool"], arguments, parse_json=step["parse_json"])
+            if not error and step["output"] and data:
+                data = step["output"](data)
+            if error or not data:
+                raise WorkflowError(f"Failed to {step['description']}: {error}")
+            return data
+    except WorkflowError:
+        raise
+    except Exception as e:
+        # Unexpected results (e.g. JSON of the wrong shape) or I/O errors fail the step, not the caller
+        logger.exception(f"Step '{step['name']}' raised {type(e).__name__}")
+        raise WorkflowError(f"Failed to {step['description']}: {type(e).__name__}: {e}") from e
+    finally:
+        timings[step["name"]] = time.perf_counter() - started
+
+
+async def run_steps(client, steps, params, timings=None, name="workflow"):
+    """
+    Runs workflow steps as a dependency graph.
+
+    A step starts as soon as every step in its ``inputs`` has finished, so
+    independent steps run concurrently and the total time follows the
+    longest dependency chain. The first failing step cancels the rest; any
+    exception raised by a step is reported as that step's failure.
+
+    Args:
+        client: Connected FastMCP client.
+        steps (list): Step definitions (see tool_step and function_step).
+        params (dict): Workflow parameters, available to every step.
+        timings (dict, optional): Filled with seconds per step plus 'total'.
+        name (str): Workflow name used for the trace span.
+
+    Returns:
+        tuple: (context dict with params and step outputs, None) on success,
+            (None, error message) on failure.
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    context = dict(params)
+    pending = {step["name"]: step for step in steps}
+    running = {}
+    done_steps = set()
+    with span(f"workflow:{name}", "workflow", **{k: str(v) for k, v in params.items()}):
+        try:
+            _check_steps(steps, params)
+            while pending or running:
+                for step_name, step in list(pending.items()):
+                    if set(step["inputs"]) <= done_steps:
+                        del pending[step_name]
+                        task = asyncio.create_task(_run_step(client, step, context, timings))
+                        running[task] = step_name
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    step_name = running.pop(task)
+                    context[step_name] = task.result()
+                    done_steps.add(step_name)
+            return context, None
+        except WorkflowError as e:
+            logger.error(str(e))
+            return None, str(e)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            timings["total"] = time.perf_counter() - started
+            logger.info("Workflow step timings: " + ", ".join(f"{k}={v:.3f}s" for k, v in timings.items()))
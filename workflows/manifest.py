@@ -0,0 +1,158 @@
+import json
+import os
+import re
+import threading
+import time
+
+from utils.config import MANIFEST_ENABLED, MANIFEST_DIR, MANIFEST_SAVE_INTERVAL, FLOW_ANALYSIS_VERSION, FLOW_CHUNK_MAX_CHARS, LLM_MODEL
+from utils.disk_cache import hash_key
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def content_hash(text):
+    """SHA-256 of a file's content, as stored in the manifest."""
+    return hash_key(str(text))
+
+
+def analysis_version():
+    """
+    Identifies how a result was produced: the prompt/analysis version, the
+    model and the chunk size. A result made under another version is redone.
+    """
+    return f"flow-v{FLOW_ANALYSIS_VERSION}/{LLM_MODEL}/{FLOW_CHUNK_MAX_CHARS}"
+
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name)
+
+
+def _write_json(path, data):
+    """Atomically replaces ``path``; the temp name is unique per thread, so concurrent writers never collide."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class Manifest:
+    """
+    Per-repository record of analysed files: filename -> content hash,
+    language, analysis version, result location and time of analysis.
+
+    Results are kept as one JSON file per source file next to the manifest
+    (``MANIFEST_DIR/<repository>/``), so a re-run can reuse the result of every
+    file whose content and analysis version have not changed.
+
+    Safe to use from several worker threads. Write failures are logged, not
+    raised: a lost entry only means the file is analysed again next time.
+    """
+
+    def __init__(self, repository, directory=MANIFEST_DIR):
+        self.repository = repository
+        self.directory = os.path.join(directory, _safe_name(repository))
+        self.path = os.path.join(self.directory, "manifest.json")
+        self.entries = {}
+        self.stats = {"reused": 0, "analysed": 0, "changed": 0}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("files", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+
+    def _result_path(self, filename):
+        return os.path.join("results", hash_key(filename)[:24] + ".json")
+
+    def lookup(self, filename, digest, version=None):
+        """
+        Returns the stored result for ``filename`` if it was produced from the
+        same content under the same analysis version, otherwise None.
+        """
+        if not MANIFEST_ENABLED:
+            return None
+        with self._lock:
+            entry = self.entries.get(filename)
+            if not entry:
+                return None
+            if entry.get("hash") != digest or entry.get("version") != (version or analysis_version()):
+                self.stats["changed"] += 1
+                return None
+        try:
+            with open(os.path.join(self.directory, entry["result"]), "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Stored result of {filename} is unusable, re-analysing: {e}")
+            return None
+        with self._lock:
+            self.stats["reused"] += 1
+        return result
+
+    def record(self, filename, digest, language, result, version=None):
+        """Stores ``result`` for ``filename`` and updates its manifest entry (saved by save())."""
+        if not MANIFEST_ENABLED:
+            return
+        location = self._result_path(filename)
+        path = os.path.join(self.directory, location)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_json(path, result)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not store the result of {filename} in the manifest: {e}")
+            return
+        with self._lock:
+            self.entries[filename] = {
+                "hash": digest,
+                "language": language,
+                "version": version or analysis_version(),
+                "result": location,
+                "analysed_at": time.time(),
+            }
+            self.stats["analysed"] += 1
+            self._dirty = True
+            # Long batches save along the way; a crash then loses at most a few entries
+            if time.monotonic() - self._saved_at > MANIFEST_SAVE_INTERVAL:
+                self.save()
+
+    def save(self):
+        """Writes the manifest if anything changed (atomic replace)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"repository": self.repository, "files": dict(self.entries)}
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                _write_json(self.path, data)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(f"Could not save manifest {self.path}: {e}")
+                return
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(repository):
+    """Return the shared Manifest of a repository (loads it on first use; call from a worker thread)."""
+    with _manifests_lock:
+        manifest = _manifests.get(repository)
+        if manifest is None:
+            manifest = Manifest(repository)
+            _manifests[repository] = manifest
+        return manifest
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import time
+
+from clients.ollama import async_chat
+from tasks.tasks import task_iter_repository_summary
+from utils.config import SUMMARY_CONCURRENCY, SUMMARY_BATCH_TOKENS, SUMMARY_DOC_MAX_TOKENS, SUMMARY_BRIEF_TOKENS
+from utils.logger import get_logger
+from utils.message_history import estimate_tokens
+from utils.tracing import span
+
+logger = get_logger(__name__)
+
+DOCUMENTS_PROMPT = (
+    "Below are analyses of programs from the repository {repository}. Summarize what each program does "
+    "in one short paragraph: its purpose, the data and files it uses, and the programs it calls. "
+    "Keep program names exact. Use at most {words} words in total.\n\n{text}"
+)
+MERGE_PROMPT = (
+    "Below are partial summaries of the repository {repository}. Combine them into one summary that keeps "
+    "program names, the main flows between programs and the key data; drop repetition. "
+    "Use at most {words} words.\n\n{text}"
+)
+BRIEF_PROMPT = (
+    "Below are summaries of the repository {repository}. Write a compact brief of the whole system for an "
+    "engineer who will ask questions about it: what it does, its main programs and how they interact, "
+    "the data it works with and notable risks. Keep program names exact. Use at most {words} words.\n\n{text}"
+)
+
+
+def _words(tokens):
+    # ~0.75 words per token
+    return max(50, int(tokens * 0.75))
+
+
+def _document_text(document):
+    """One analysed document as prompt text, cut to SUMMARY_DOC_MAX_TOKENS; None if it has no analysis."""
+    if not isinstance(document, dict) or not document.get("analysis"):
+        return None
+    analysis = document["analysis"]
+    if not isinstance(analysis, str):
+        analysis = json.dumps(analysis, ensure_ascii=False)
+    return f"filename {document.get('filename')}: {analysis}"[:SUMMARY_DOC_MAX_TOKENS * 4]
+
+
+def _pack(texts, batch_tokens, min_group=1):
+    """Groups texts in order into batches of about batch_tokens (at least min_group per batch)."""
+    groups, current, size = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and size + tokens > batch_tokens and len(current) >= min_group:
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += tokens
+    if current:
+        if groups and len(current) < min_group:
+            groups[-1].extend(current)
+        else:
+            groups.append(current)
+    return groups
+
+
+async def summarize_repository(
+    client, ollama_client, llm_model, repository,
+    token_budget=SUMMARY_BRIEF_TOKENS, batch_tokens=SUMMARY_BATCH_TOKENS,
+    concurrency=SUMMARY_CONCURRENCY, stats=None,
+):
+    """
+    Map-reduce summary of summarize_repository_scope output.
+
+    Documents are streamed from the tool and packed into batches of about
+    ``batch_tokens``; batches are summarised ``concurrency`` at a time as soon
+    as they fill. The summaries are then merged level by level (again in
+    parallel batches) until they fit in one call, which writes the final
+    brief of about ``token_budget`` tokens.
+
+    Args:
+        client: FastMCP client.
+        ollama_client: Async Ollama client instance.
+        llm_model (str): Model used for every summary.
+        repository (str): Repository name.
+        token_budget (int): Target size of the brief.
+        batch_tokens (int): Input size of each summarisation call.
+        concurrency (int): Maximum LLM calls in flight.
+        stats (dict, optional): Filled with 'documents', 'llm_calls', 'levels',
+            'failed_batches' and 'elapsed_s'.
+
+    Returns:
+        str or None: The repository brief, or None if nothing could be summarised.
+    """
+    stats = {} if stats is None else stats
+    stats.update({"documents": 0, "llm_calls": 0, "levels": 0, "failed_batches": 0})
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def summarize(template, texts, words):
+        prompt = template.format(repository=repository, words=words, text="\n\n".join(texts))
+        async with semaphore:
+            stats["llm_calls"] += 1
+            summary = await async_chat(ollama_client, llm_model, [{"role": "user", "content": prompt}])
+        if not summary:
+            stats["failed_batches"] += 1
+            logger.warning(f"Summary of {len(texts)} parts of {repository} failed; they are left out.")
+        return summary
+
+    def map_words(texts):
+        # A summary may use ~1/4 of its input, and at least a quarter of the brief budget
+        return _words(max(token_budget // 4, sum(estimate_tokens(t) for t in texts) // 4))
+
+    with span(f"summarize:{repository}", "workflow") as trace_args:
+        # Map: summarise document batches while the rest are still being decoded
+        tasks, batch, size = [], [], 0
+        try:
+            async for document in task_iter_repository_summary(client, repository):
+                text = _document_text(document)
+                if not text:
+                    continue
+                stats["documents"] += 1
+                tokens = estimate_tokens(text)
+                if batch and size + tokens > batch_tokens:
+                    tasks.append(asyncio.create_task(summarize(DOCUMENTS_PROMPT, batch, map_words(batch))))
+                    batch, size = [], 0
+                batch.append(text)
+                size += tokens
+            if batch:
+                tasks.append(asyncio.create_task(summarize(DOCUMENTS_PROMPT, batch, map_words(batch))))
+            summaries = [s for s in await asyncio.gather(*tasks) if s]
+        finally:
+            for task in tasks:
+                task.cancel()
+        stats["levels"] = 1
+
+        # Reduce: merge in parallel batches until everything fits in one call
+        while sum(estimate_tokens(s) for s in summaries) > batch_tokens and len(summaries) > 1:
+            groups = _pack(summaries, batch_tokens, min_group=2)
+            merged = await asyncio.gather(*(summarize(MERGE_PROMPT, group, map_words(group)) for group in groups))
+            summaries = [s for s in merged if s]
+            stats["levels"] += 1
+
+        brief = None
+        if summaries:
+            brief = await summarize(BRIEF_PROMPT, summaries, _words(token_budget)) or "\n\n".join(summaries)
+            stats["levels"] += 1
+        stats["elapsed_s"] = time.perf_counter() - started
+        trace_args.update(stats)
+
+    logger.info(f"Repository brief for {repository}: {stats}")
+    return brief
@@ -1,121 +1,372 @@
-from fastmcp import Client as FastMCPClient
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import TYPE_CHECKING
+import time
+from tasks.tasks import task_list_repository_files, task_extract_edges, task_extract_flow
+from utils.call_graph import CallGraph, program_flow_edges, save_call_graph
+from utils.config import BATCH_CONCURRENCY, BATCH_OUTPUT_DIR, FLOW_CHUNK_MAX_CHARS, FLOW_CHUNK_CONCURRENCY
+from utils.config import CALL_GRAPH_CONCURRENCY
+from utils.config import get_async_llm_client, get_llm_model
 from utils.logger import get_logger
-from utils.mcp_tools_helper import (
-    safe_call_tool_json,
-    safe_call_tool_text,
-    get_first_text,
-)
+from utils.mcp_tools_helper import get_first_text, safe_call_tool
+from utils.mcp_session import connected
 from utils.mcp_utils import pretty_print_json
 from utils.prompts_utils import print_agent, print_llm_response
 from utils.prompts_utils import print_menu
+from utils.result_store import get_result_store, flow_edges
+from workflows.batch import run_batch
+from workflows.chunking import split_source, merge_flows
+from workflows.engine import WorkflowError, run_steps, tool_step, function_step
+from workflows.manifest import content_hash, get_manifest
+from workflows.summarize import summarize_repository
 import json
 
+if TYPE_CHECKING:
+    from fastmcp import Client as FastMCPClient
+
 logger = get_logger(__name__)
 
 
+def _require_object(data):
+    """Step output check for tools that must return one JSON object."""
+    if not isinstance(data, dict):
+        raise WorkflowError(f"Expected a JSON object, got {type(data).__name__}: {str(data)[:200]}")
+    return data
+
+
+def _require_language(context):
+    language = context["doc_info"].get("language")
+    if not language:
+        raise WorkflowError("Language not detected in document info.")
+    return language
+
+
+FETCH_AND_CLASSIFY_STEPS = [
+    tool_step(
+        "repo_name", "fetch_repository",
+        lambda ctx: {"repo_url": ctx["repo_url"]},
+        output=get_first_text,
+        description="fetch repository",
+    ),
+    tool_step(
+        "classification", "classify_repository",
+        lambda ctx: {"repository_name": ctx["repo_name"]},
+        inputs=["repo_name"],
+        output=get_first_text,
+        description="classify repository",
+    ),
+]
+
+DOCUMENT_INFORMATION_STEPS = [
+    tool_step(
+        "doc_info", "get_document_info",
+        lambda ctx: {"repository": ctx["repo_name"], "filename": ctx["filename"]},
+        parse_json=True,
+        output=_require_object,
+        description="get document info",
+    ),
+    tool_step(
+        "filecontent", "retrieve_file_content",
+        lambda ctx: {"repository_name": ctx["repo_name"], "filename": ctx["filename"]},
+        output=get_first_text,
+        description="get file content",
+    ),
+]
+
+CHUNK_PROMPT_NOTE = (
+    "\n\nThe source above is part {part} of {total} of {filename}. Extract the flow of this part only; "
+    "calls and PERFORMs of paragraphs defined in other parts are still edges of the flow."
+)
+
+
+async def _previous_analysis(client, context):
+    """
+    Content hash of the file and, if it was analysed before with the same
+    content and analysis version, the stored flow ('flow' is None otherwise).
+    """
+    digest = content_hash(context["filecontent"])
+    manifest = await asyncio.to_thread(get_manifest, context["repo_name"])
+    flow = await asyncio.to_thread(manifest.lookup, context["filename"], digest)
+    if flow is not None:
+        logger.info(f"{context['filename']}: unchanged since last analysis, reusing its flow")
+    return {"hash": digest, "flow": flow}
+
+
+async def _chunk_source(client, context):
+    chunks = split_source(str(context["filecontent"]), _require_language(context), FLOW_CHUNK_MAX_CHARS)
+    if len(chunks) > 1:
+        logger.info(f"{context['filename']}: {len(context['filecontent'])} chars split into {len(chunks)} chunks")
+    return chunks
+
+
+async def _extract_chunk_flow(client, context, chunk, part, total):
+    """Prompt + flow extraction for one chunk (the whole file when total is 1)."""
+    where = f" (part {part}/{total})" if total > 1 else ""
+    prompts, error = await safe_call_tool(client, "get_language_specific_prompt", {
+        "language": _require_language(context),
+        "source_code": chunk,
+        "repository_name": context["repo_name"],
+        "filename": context["filename"],
+    }, parse_json=True)
+    if error or not prompts:
+        raise WorkflowError(f"Failed to get language-specific prompt{where}: {error}")
+    prompts = _require_object(prompts)
+
+    llm_prompt = str(prompts.get("llm_prompt"))
+    if total > 1:
+        llm_prompt += CHUNK_PROMPT_NOTE.format(part=part, total=total, filename=context["filename"])
+    flow, error = await safe_call_tool(client, "extract_flow_with_specific_prompt", {
+        "system_prompt": str(prompts.get("system_prompt")),
+        "llm_prompt": llm_prompt,
+    }, parse_json=True)
+    if error or not flow:
+        raise WorkflowError(f"Failed to extract flow{where}: {error}")
+    return flow
+
+
+async def _store_flow(context, flow):
+    """Writes the document info and flow of the file to the result store."""
+    store = get_result_store()
+    await asyncio.to_thread(store.save_document, context["repo_name"], context["filename"], context["doc_info"])
+    await asyncio.to_thread(
+        store.save_flow, context["repo_name"], context["filename"], flow, context["doc_info"].get("language")
+    )
+
+
+async def _extract_flow(client, context):
+    """
+    Map-reduce: extracts every chunk (FLOW_CHUNK_CONCURRENCY at a time) and
+    merges the partial flows. Unchanged files reuse their stored flow; new
+    results are recorded in the repository manifest. Either way the flow is
+    written to the result store.
+    """
+    previous = context["previous"]
+    if previous["flow"] is not None:
+        await _store_flow(context, previous["flow"])
+        return previous["flow"]
+    chunks = context["chunks"]
+    semaphore = asyncio.Semaphore(FLOW_CHUNK_CONCURRENCY)
+
+    async def extract(part, chunk):
+        async with semaphore:
+            return await _extract_chunk_flow(client, context, chunk, part, len(chunks))
+
+    tasks = [asyncio.create_task(extract(part, chunk)) for part, chunk in enumerate(chunks, 1)]
+    try:
+        partials = await asyncio.gather(*tasks)
+    finally:
+        # One failed chunk fails the file; stop the others
+        for task in tasks:
+            task.cancel()
+    flow = merge_flows(partials)
+    if len(chunks) > 1 and isinstance(flow, dict):
+        flow["source_chunks"] = len(chunks)
+    manifest = await asyncio.to_thread(get_manifest, context["repo_name"])
+    await asyncio.to_thread(
+        manifest.record, context["filename"], previous["hash"], _require_language(context), flow,
+    )
+    await _store_flow(context, flow)
+    return flow
+
+
+DOCUMENT_FLOW_STEPS = [
+    *DOCUMENT_INFORMATION_STEPS,
+    function_step(
+        "previous", _previous_analysis,
+        inputs=["filecontent"],
+        description="look up previous analysis",
+    ),
+    function_step(
+        "chunks", _chunk_source,
+        inputs=["doc_info", "filecontent"],
+        description="split source into chunks",
+    ),
+    function_step(
+        "flow", _extract_flow,
+        inputs=["doc_info", "chunks", "previous"],
+        description="extract flow",
+    ),
+]
+
+
 async def workflow_fetch_and_classify_repository(client, repo_url):
     """
     Fetches a repository from a given URL and classifies it.
     Returns (repository_name, classification).
     """
-    async with client:
-        await client.ping()
+    async with connected(client) as client:
         logger.info("Starting workflow: fetch and classify repository")
-
-        repo_name, error = await safe_call_tool_text(client, "fetch_repository", {"repo_url": repo_url})
-        if error or not repo_name:
-            logger.error(f"Failed to fetch repository: {error}")
-            return None
-
-        classification, error = await safe_call_tool_text(client, "classify_repository", {"repository_name": repo_name})
+        context, error = await run_steps(
+            client, FETCH_AND_CLASSIFY_STEPS, {"repo_url": repo_url}, name="fetch_and_classify_repository"
+        )
         if error:
-            logger.error(f"Failed to classify repository: {error}")
             return None
 
-        print_agent(f"Repository '{repo_name}' classified as: {classification}")
-        return repo_name, classification
+    repo_name, classification = context["repo_name"], context["classification"]
+    print_agent(f"Repository '{repo_name}' classified as: {classification}")
+    return repo_name, classification
 
 
 async def workflow_get_document_information(client: FastMCPClient, repo_name: str, filename: str):
     """
-    Retrieves document metadata and file content.
+    Retrieves document metadata and file content (fetched concurrently).
     Returns a combined dictionary with document info and content.
     """
-    async with client:
-        await client.ping()
-
-        doc_info, error = await safe_call_tool_json(client, "get_document_info", {"repository": repo_name, "filename": filename})
-        if error or not doc_info:
-            logger.error(f"Failed to get document info: {error}")
-            return None
-
-        filecontent, error = await safe_call_tool_text(client, "retrieve_file_content", {"repository_name": repo_name, "filename": filename})
-        if error or not filecontent:
-            logger.error(f"Failed to get file content: {error}")
+    async with connected(client) as client:
+        context, error = await run_steps(
+            client, DOCUMENT_INFORMATION_STEPS, {"repo_name": repo_name, "filename": filename},
+            name="document_information",
+        )
+        if error:
             return None
 
-        result = dict(doc_info)
-        result["filecontent"] = get_first_text(filecontent)
+    await asyncio.to_thread(get_result_store().save_document, repo_name, filename, context["doc_info"])
+    result = dict(context["doc_info"])
+    result["filecontent"] = context["filecontent"]
 
-        print_agent("Document Info:")
-        print_llm_response(json.dumps({k: v for k, v in result.items() if k != "filecontent"}, indent=2))
+    print_agent("Document Info:")
+    print_llm_response(json.dumps({k: v for k, v in result.items() if k != "filecontent"}, indent=2))
 
-        print_llm_response("\nFile Content:\n")
-        print(result["filecontent"])
-        return result
+    print_llm_response("\nFile Content:\n")
+    print(result["filecontent"])
+    return result
 
 
 async def workflow_get_document_flow(client: FastMCPClient, repo_name: str, filename: str):
     """
     Extracts execution flow from document using language-specific prompt.
+    Document info and source code are fetched concurrently; sources larger
+    than FLOW_CHUNK_MAX_CHARS are extracted in chunks and the flows merged.
     Returns structured JSON result.
     """
-    async with client:
-        await client.ping()
-
-        doc_info, error = await safe_call_tool_json(client, "get_document_info", {"repository": repo_name, "filename": filename})
-        if error or not doc_info:
-            logger.error(f"Failed to get document info: {error}")
+    async with connected(client) as client:
+        context, error = await run_steps(
+            client, DOCUMENT_FLOW_STEPS, {"repo_name": repo_name, "filename": filename},
+            name="document_flow",
+        )
+        manifest = await asyncio.to_thread(get_manifest, repo_name)
+        await asyncio.to_thread(manifest.save)
+        if error:
             return None
 
-        source_code, error = await safe_call_tool_text(client, "retrieve_file_content", {"repository_name": repo_name, "filename": filename})
-        if error or not source_code:
-            logger.error(f"Failed to get source code: {error}")
-            return None
+    json_data = context["flow"]
+    pretty_print_json(json_data)
+    return json_data
 
-        language = doc_info.get("language")
-        if not language:
-            logger.error("Language not detected in document info.")
-            return None
 
-        prompts, error = await safe_call_tool_json(
-            client,
-            "get_language_specific_prompt",
-            {
-                "language": language,
-                "source_code": str(get_first_text(source_code)),
-                "repository_name": repo_name,
-                "filename": filename,
-            }
-        )
-        if error or not prompts:
-            logger.error(f"Failed to get language-specific prompt: {error}")
+async def workflow_batch_document_flow(
+    client: FastMCPClient, repo_name: str, output_path: str = "", concurrency: str = ""
+):
+    """
+    Extracts the flow of every file in a repository, with bounded concurrency.
+    Results are appended to a JSONL file as they complete; re-running with the
+    same output file resumes where the previous run stopped. Files whose
+    content is unchanged since their last analysis (see workflows/manifest.py)
+    reuse the stored flow, so re-analysis into a new output file only sends the
+    changed files to the LLM.
+    Returns the batch summary (ok/error/skipped counts and elapsed time).
+    """
+    output_path = output_path or os.path.join(BATCH_OUTPUT_DIR, f"{repo_name}_flows.jsonl")
+    concurrency = int(concurrency) if str(concurrency).strip().isdigit() else BATCH_CONCURRENCY
+
+    async with connected(client) as client:
+        filenames = await task_list_repository_files(client, repo_name)
+        if not filenames:
+            print_agent(f"No files found for repository '{repo_name}'.")
             return None
+        print_agent(f"Extracting flows for {len(filenames)} files (concurrency {concurrency}) -> {output_path}")
+        manifest = await asyncio.to_thread(get_manifest, repo_name)
+        reused = manifest.stats["reused"]
+        try:
+            summary = await run_batch(
+                client, repo_name, filenames, DOCUMENT_FLOW_STEPS, "flow", output_path, concurrency,
+                name="document_flow",
+            )
+        finally:
+            await asyncio.to_thread(manifest.save)
+        summary["unchanged"] = manifest.stats["reused"] - reused
 
-        json_data, error = await safe_call_tool_json(
-            client,
-            "extract_flow_with_specific_prompt",
-            {
-                "system_prompt": str(prompts.get("system_prompt")),
-                "llm_prompt": str(prompts.get("llm_prompt")),
-            }
-        )
-        if error or not json_data:
-            logger.error(f"Failed to extract flow: {error}")
+    print_agent(
+        f"Done: {summary['ok']} ok ({summary['unchanged']} unchanged), {summary['error']} failed, "
+        f"{summary['skipped']} skipped in {summary['elapsed']:.1f}s"
+    )
+    return summary
+
+
+async def workflow_summarize_repository(client: FastMCPClient, repo_name: str):
+    """
+    Builds a compact brief of a repository from summarize_repository_scope,
+    summarising documents in parallel batches and then merging the summaries.
+    Returns the brief text.
+    """
+    stats = {}
+    try:
+        brief = await summarize_repository(client, get_async_llm_client(), get_llm_model(), repo_name, stats=stats)
+    except Exception as e:
+        logger.error(f"Repository summary failed: {e}")
+        print_agent(f"Could not summarize repository '{repo_name}': {e}")
+        return None
+    if not brief:
+        print_agent(f"No analysed documents found for repository '{repo_name}'.")
+        return None
+    print_agent(
+        f"Brief of {repo_name} ({stats['documents']} documents, {stats['llm_calls']} LLM calls, "
+        f"{stats['levels']} levels, {stats['elapsed_s']:.1f}s):"
+    )
+    print_llm_response(brief)
+    return brief
+
+
+async def workflow_build_call_graph(client: FastMCPClient, repo_name: str, include_flows: str = ""):
+    """
+    Builds the call graph of a repository from find_edges for every file
+    (CALL_GRAPH_CONCURRENCY at a time) and saves it for the 'graph' command.
+    With include_flows set (yes/true/1), paragraph-level edges from
+    extract_flow are added too. Returns the graph statistics.
+    """
+    include_flows = str(include_flows).strip().lower() in ("1", "yes", "y", "true")
+    started = time.perf_counter()
+    async with connected(client) as client:
+        filenames = await task_list_repository_files(client, repo_name)
+        if not filenames:
+            print_agent(f"No files found for repository '{repo_name}'.")
             return None
+        semaphore = asyncio.Semaphore(CALL_GRAPH_CONCURRENCY)
+
+        async def fetch_edges(filename):
+            async with semaphore:
+                edges = await task_extract_edges(client, repo_name, filename)
+                flow = await task_extract_flow(client, repo_name, filename) if include_flows else None
+            return filename, edges, flow
 
-        pretty_print_json(json_data)
-        return json_data
+        results = await asyncio.gather(*(fetch_edges(filename) for filename in filenames))
+
+    programs = set(filenames)
+    edges, failed = [], 0
+    for filename, file_edges, flow in results:
+        if file_edges is None:
+            failed += 1
+            continue
+        edges.extend(flow_edges(file_edges))
+        if flow is not None:
+            edges.extend(program_flow_edges(filename, flow, programs))
+    graph = CallGraph.from_edges(edges, repository=repo_name)
+    path = await asyncio.to_thread(save_call_graph, graph)
+
+    stats = {
+        "files": len(filenames), "failed": failed, "nodes": graph.node_count, "edges": graph.edge_count,
+        "cycles": len(graph.cycles()), "entry_points": len(graph.entry_points()),
+        "elapsed_s": round(time.perf_counter() - started, 2), "path": path,
+    }
+    logger.info(f"Call graph of {repo_name}: {stats}")
+    print_agent(
+        f"Call graph of {repo_name}: {stats['nodes']} nodes, {stats['edges']} edges, {stats['cycles']} cycles, "
+        f"{stats['entry_points']} entry points ({failed} files failed, {stats['elapsed_s']}s). "
+        f"Query it with: graph {repo_name} <callers|callees|reach|impact|cycles|entries|paths> ..."
+    )
+    return stats
 
 
 WORKFLOWS = [
@@ -123,20 +374,44 @@ WORKFLOWS = [
         "name": "Fetch and Classify Repository",
         "function": workflow_fetch_and_classify_repository,
         "params": ["repo_url"],
+        "steps": FETCH_AND_CLASSIFY_STEPS,
         "description": "Fetch a repository and classify it.",
     },
     {
         "name": "Get Document Info",
         "function": workflow_get_document_information,
         "params": ["repo_name", "filename"],
+        "steps": DOCUMENT_INFORMATION_STEPS,
         "description": "Get Document Information.",
     },
     {
         "name": "Extract Document Flow",
         "function": workflow_get_document_flow,
         "params": ["repo_name", "filename"],
+        "steps": DOCUMENT_FLOW_STEPS,
         "description": "Extracts the execution flow of a program, starting from its primary entry point, and returns it in structured JSON.",
     },
+    {
+        "name": "Batch Extract Repository Flows",
+        "function": workflow_batch_document_flow,
+        "params": ["repo_name", "output_path", "concurrency"],
+        "steps": DOCUMENT_FLOW_STEPS,
+        "description": "Extracts the flow of every file in a repository concurrently, writing JSONL results with resume support.",
+    },
+    {
+        "name": "Summarize Repository",
+        "function": workflow_summarize_repository,
+        "params": ["repo_name"],
+        "steps": [],
+        "description": "Summarizes every analysed document in parallel batches, then merges the summaries into a compact brief.",
+    },
+    {
+        "name": "Build Call Graph",
+        "function": workflow_build_call_graph,
+        "params": ["repo_name", "include_flows"],
+        "steps": [],
+        "description": "Builds and saves the repository call graph from find_edges (optionally extract_flow) for impact analysis queries.",
+    },
 ]
 
 